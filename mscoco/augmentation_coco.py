@@ -1,35 +1,44 @@
 from PIL import Image
 import os
 import json
+import array
 import numpy as np
-from core.utils import *
+from core.utils_coco import *
 from random import *
 import time
 import math
 
 def process_data(caption_file, image_dir):
-    with open(caption_file) as f:
-        caption_data = json.load(f)
-    # build word to idx
-    dic = {}
+    # categories and annotations come from one pass over the file; the categories follow the
+    # annotations in COCO files, so category ids are mapped to labels once both are read
     idx_to_word = {}
+    # annotations are streamed into flat typed buffers instead of per-image lists
+    image_ids = array.array('l')
+    category_ids = array.array('l')
+    bboxes = array.array('d')
+    for key, item in iter_json_arrays(caption_file, ['categories', 'annotations']):
+        if key == 'categories':
+            idx_to_word[item['id']] = item['name']
+        else:
+            image_ids.append(item['image_id'])
+            category_ids.append(item['category_id'])
+            bboxes.extend(float(x) for x in item['bbox'])
+    # build word to idx
     word_to_idx = {}
-    for cate in caption_data['categories']:
-        idx_to_word[cate['id']] = cate['name']
-        dic[cate['name']] = 0
-    idx = 0
-    for key in sorted(dic.iterkeys()):
+    for idx, key in enumerate(sorted(set(idx_to_word.itervalues()))):
         word_to_idx[key] = idx
-        idx += 1
-    data = {}
-    for annotation in caption_data['annotations']:
-        image_id = annotation['image_id']
-        bbox = annotation['bbox']
-        if not image_id in data:
-            data[image_id] = []
-        category_name = idx_to_word[annotation['category_id']]
-        caption_index = word_to_idx[category_name]
-        data[image_id] += [(caption_index, bbox)]
+    category_to_idx = dict((cate_id, word_to_idx[name]) for cate_id, name in idx_to_word.iteritems())
+    labels = np.array([category_to_idx[cate_id] for cate_id in category_ids], dtype=np.int8)
+    image_ids = np.frombuffer(image_ids, dtype=np.int_)
+    bboxes = np.frombuffer(bboxes, dtype=np.float64).reshape(-1, 4)
+
+    # group by image: image i owns labels/bboxes[offsets[i]:offsets[i+1]]
+    order = np.argsort(image_ids, kind='mergesort')
+    image_ids, starts = np.unique(image_ids[order], return_index=True)
+    data = {'image_ids': image_ids,
+            'offsets': np.append(starts, len(order)),
+            'labels': labels[order],
+            'bboxes': bboxes[order]}
     return data, word_to_idx
 
 def union_ratio(bbox, axes):
@@ -90,14 +99,16 @@ def main():
     images = []
     count = 0
     available = 0
-    for i, image_id in enumerate(data):
+    for i, image_id in enumerate(data['image_ids']):
+        start, end = data['offsets'][i], data['offsets'][i+1]
+        pair_list = zip(data['labels'][start:end], data['bboxes'][start:end])
         id_string = str(image_id)
         file_name = 'COCO_' + split + '2014_' + \
                         '0'*(12-len(id_string)) + id_string +'.jpg'
         image_file = folder + file_name
         with open(image_file, 'r+b') as f:
             with Image.open(f) as image:
-                crop_tuples = crop(image, data[image_id])
+                crop_tuples = crop(image, pair_list)
                 for t in crop_tuples:
                     caption = ''
                     for l in t[1]:
@@ -0,0 +1,25 @@
+import sys
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/mscoco')
+
+# Queries results.db, the runs recorded by <split>/evaluate.py and <split>/evaluate_all.py:
+#   python query_results.py best <metric> [split] [model] [n]   the n best runs by o_f1, c_f1, average, ...
+#   python query_results.py table <model> <table file> [split]  result.py's table of every run of a model
+
+from core.metrics import *
+from core.results_db import *
+
+db_path = 'results.db'
+command = sys.argv[1]
+if command == 'best':
+    metric = sys.argv[2]
+    split = sys.argv[3] if len(sys.argv) > 3 else 'val'
+    model = sys.argv[4] if len(sys.argv) > 4 else None
+    n = int(sys.argv[5]) if len(sys.argv) > 5 else 10
+    for model, epoch, thres, metrics in query_runs(db_path, model, split, order_by=metric, limit=n):
+        print '%s  epoch = %s  thres = %s: ' % (model, str(epoch), str(thres)) + \
+              ' '.join('%s %.4f' % (key, metrics[key]) for key in METRIC_COLUMNS)
+elif command == 'table':
+    split = sys.argv[4] if len(sys.argv) > 4 else 'test'
+    write_run_table(sys.argv[3], query_runs(db_path, sys.argv[2], split))
+else:
+    print 'usage: python query_results.py best <metric> [split] [model] [n] | table <model> <table file> [split]'
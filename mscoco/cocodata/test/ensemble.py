@@ -0,0 +1,36 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/mscoco')
+
+# Ensemble of any number of [N, 80] score files (e.g. test.init.pred.hkl), memory-mapped and
+# combined chunk by chunk:
+#   python ensemble.py <mean|rank|max> <uniform|fit> <result file> <member> [<member> ...]
+# a member is a score file with %s in place of the split, e.g. '../%s/%s.init.pred.hkl';
+# 'fit' picks the weights on val by greedy selection on objective, then scores split.
+
+method = sys.argv[1]
+weighting = sys.argv[2]
+resultFile = sys.argv[3]
+templates = sys.argv[4:]
+split = 'test'
+thres = 0.5
+objective = 'map'    # or 'o_f1' / 'c_f1' at thres
+ap_mode = 'area'     # or 'voc07' for the 11-point AP
+cache_dir = None     # where the .npy copies of .hkl/.pkl members go (None: next to them)
+
+from core.utils_coco import *
+from core.ensemble import *
+
+def member_path(template, split):
+    return template.replace('%s', split)
+
+def split_references(split):
+    return label_counts(reference_labels(load_coco_references(data_path='..', split=split)), 80)
+
+weights = None
+if weighting == 'fit':
+    val_members = [open_scores(member_path(template, 'val'), cache_dir) for template in templates]
+    weights = fit_weights(val_members, split_references('val'), method, objective, thres, ap_mode)
+members = [open_scores(member_path(template, split), cache_dir) for template in templates]
+metrics = evaluate_ensemble(members, split_references(split), weights, method, thres, ap_mode)
+write_ensemble(resultFile, method, [member_path(template, split) for template in templates], weights, metrics)
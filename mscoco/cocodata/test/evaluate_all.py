@@ -0,0 +1,34 @@
+import sys
+import glob
+import time
+import numpy as np
+from multiprocessing import Pool
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/mscoco')
+
+# Evaluates every candidate pickle matching a glob in a process pool, with the references
+# loaded once, records every run in ../results.db and writes one table in result.py's layout:
+#   python evaluate_all.py 'test.candidate.captions_mscoco_recursive_concat-*.pkl' <table file> [split] [processes]
+
+candidatePattern = sys.argv[1]
+tableFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+from core.utils_coco import *
+from core.metrics import *
+from core.results_db import *
+ref_counts = label_counts(reference_labels(load_coco_references(data_path='..', split=split)), 80)
+
+def evaluate_file(path):
+    start_t = time.time()
+    candidate = load_pickle(path)
+    metrics = count_metrics(label_counts(candidate, 80), ref_counts[:len(candidate)])
+    metrics['seconds'] = time.time() - start_t
+    return parse_run_name(path) + (metrics,)
+
+pool = Pool(n_processes)
+paths = sorted(glob.glob(candidatePattern))
+runs = pool.map(evaluate_file, paths)
+pool.close()
+record_runs('../results.db', split, runs, paths)
+write_run_table(tableFile, runs)
@@ -0,0 +1,29 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/mscoco')
+
+# O-F1/C-F1 versus threshold of raw [N, 80] scores (e.g. test.init.pred.hkl), with the best
+# global and per-class thresholds, from one pass over the scores:
+#   python threshold_curve.py <scores.hkl|.pkl> <result file> [split] [n_thresholds]
+# pick the thresholds on the val split and apply them to test.
+
+scoreFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_thresholds = int(sys.argv[4]) if len(sys.argv) > 4 else 1000
+
+from core.utils_coco import *
+from core.metrics import *
+import hickle
+scores = hickle.load(scoreFile) if scoreFile.endswith('.hkl') else np.asarray(load_pickle(scoreFile))
+reference = reference_labels(load_coco_references(data_path='..', split=split))
+targets = label_counts(reference, 80)[:len(scores)] > 0
+
+word_to_idx = load_word2idx(data_path='/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata', split='train')
+idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
+
+# the distinct scores (or n_thresholds quantiles of them) rather than a fixed grid
+thresholds = score_thresholds(scores, n_thresholds)
+curve = threshold_curve(scores, targets, thresholds)
+class_metrics = multilabel_metrics(scores, targets, best_thresholds(curve, thresholds)['class'][np.newaxis])
+write_threshold_curve(resultFile, thresholds, curve, [idx_to_word[c] for c in range(80)], class_metrics)
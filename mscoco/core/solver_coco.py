@@ -8,6 +8,8 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_coco import *
+from metrics import *
+from results_db import *
 
 
 class CaptioningSolver(object):
@@ -33,6 +35,7 @@ class CaptioningSolver(object):
             - pretrained_model: String; pretrained model path
             - model_path: String; model path for saving
             - test_model: String; model path for test
+            - features: String; name of the feature files to train on, e.g. 'features_pca256'
         """
 
         self.model = model
@@ -50,6 +53,7 @@ class CaptioningSolver(object):
         self.pretrained_model = kwargs.pop('pretrained_model', None)
         self.test_model = kwargs.pop('test_model', './model/lstm/model-1')
         self.V = kwargs.pop('V', 83)
+        self.features = kwargs.pop('features', 'features')
         self.n_time_step = kwargs.pop('n_time_step', 16)
 
         # set an optimizer by update rule
@@ -118,7 +122,7 @@ class CaptioningSolver(object):
                     print 'part ' + str(p+1) + ' of ' + 'epoch ' + str(e+1)
                     print '##################'
                     self.data = load_coco_data(data_path=self.data_path, split='train', \
-                                               part=str(p), load_init_pred=True)
+                                               part=str(p), load_init_pred=True, features=self.features)
                     n_examples = self.data['captions'].shape[0]
                     n_iters_per_part = int(np.ceil(float(n_examples)/self.batch_size))
                     features = self.data['features']
@@ -127,10 +131,7 @@ class CaptioningSolver(object):
 
                     # groundtruth, logits_mask and end_time
                     groundtruth = np.zeros((n_examples, self.V), dtype=np.float32)
-                    for n, caption in enumerate(captions):
-                        for index in caption:
-                            if index > 2:
-                                groundtruth[n][index] = 1.0
+                    groundtruth[:, 3:] = label_matrix(self.data, self.V - 3)
 
                     label_num = np.sum(groundtruth, axis=1)
                     masks = np.ones((self.n_time_step, n_examples, self.V), dtype=np.float32)
@@ -234,13 +235,16 @@ class CaptioningSolver(object):
             start_t = time.time()
             for thres_iter in range(1):
                 all_sam_cap = []
+                all_sam_scores = []
+                evaluator = StreamingEvaluator(label_counts(reference_labels(load_coco_references(data_path='./cocodata', split=split)), 80))
                 all_alphas = []
                 THRES = thres
                 for i in range(num_iter):
                     if i % 50 == 0:
-                        print "Iteration: ", i
+                        print "Iteration: ", i, evaluator.status()
                     features_batch = features[i:i+1]
                     init_pred_batch = init_pred[i:i+1]
+                    beam_scores = {}
                     pathProbs = []
                     for k in range(K):
                         pathProbs.append(1.0)
@@ -296,20 +300,36 @@ class CaptioningSolver(object):
                             break
                         paths_info = newPaths_info
                         pathProbs = newPathProbs
+                        for beam, beam_prob in zip(paths_info, pathProbs):
+                            beam_scores[tuple(beam[0])] = beam_prob
                     all_sam_cap.append(paths_info[0][0])
+                    # beam score of every prefix of the path, i.e. of each label in decoding order
+                    all_sam_scores.append([beam_scores[tuple(all_sam_cap[-1][:m+1])] for m in range(len(all_sam_cap[-1]))])
+                    evaluator.update(all_sam_cap[-1:])
                     alphas = paths_info[0][3]
                     alpha_list = np.transpose(alphas, (1, 0, 2))     # (N, T, L)
                     all_alphas.append(alpha_list)
                 all_decoded = decode_py_captions(all_sam_cap, self.model.idx_to_word)
-                save_pickle(all_sam_cap, "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % \
-                            (split, split, filename, THRES))
+                candidate_file = "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % (split, split, filename, THRES)
+                if save_sampled_captions:
+                    save_pickle(all_sam_cap, candidate_file)
+                    save_pickle(zip(all_sam_cap, all_sam_scores), "./cocodata/%s/%s.ranked.captions_%s_%s.pkl" % \
+                                (split, split, filename, THRES))
+                metrics = evaluator.metrics()
+                metrics['seconds'] = time.time() - evaluator.start_t
+                write_result("./cocodata/%s/result_%s_%s.txt" % (split, filename, THRES), metrics)
+                record_runs('./cocodata/results.db', split, [parse_run_name(candidate_file) + (metrics,)], [candidate_file])
+                print format_metrics(metrics)
+                ranking = ranking_metrics(pad_rankings(all_sam_cap), evaluator.ref_counts)
+                write_ranking("./cocodata/%s/ranking_%s_%s.txt" % (split, filename, THRES), ranking)
+                print 'R@3: %.4f' % ranking['r@3']
                 print "Time cost: ", time.time()- start_t
 
             image_file_name = 'visualization/'
             if attention_visualization:
                 num_samples = len(all_decoded)
                 ran_arr = np.random.randint(num_samples, size=10)
-                reference = load_pickle('./cocodata/val/val.references.pkl')
+                reference = load_coco_references(data_path='./cocodata', split='val')
                 sample_file = open('sample.txt', 'w')
                 sample_file.write('Grountruth:\n')
                 for idx in ran_arr:
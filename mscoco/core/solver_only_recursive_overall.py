@@ -8,6 +8,8 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_coco import *
+from metrics import *
+from results_db import *
 
 
 class CaptioningSolver(object):
@@ -127,10 +129,7 @@ class CaptioningSolver(object):
 
                     # groundtruth, logits_mask and end_time
                     groundtruth = np.zeros((n_examples, self.V), dtype=np.float32)
-                    for n, caption in enumerate(captions):
-                        for index in caption:
-                            if index > 2:
-                                groundtruth[n][index] = 1.0
+                    groundtruth[:, 3:] = label_matrix(self.data, self.V - 3)
 
                     label_num = np.sum(groundtruth, axis=1)
                     masks = np.ones((self.n_time_step, n_examples, self.V), dtype=np.float32)
@@ -236,14 +235,17 @@ class CaptioningSolver(object):
             start_t = time.time()
             for thres_iter in range(1):
                 all_sam_cap = []
+                all_sam_scores = []
+                evaluator = StreamingEvaluator(label_counts(reference_labels(load_coco_references(data_path='./cocodata', split=split)), 80))
                 all_alphas = []
                 # THRES = 0.05*(thres_iter+1)
                 THRES = thres
                 for i in range(num_iter):
                     if i % 50 == 0:
-                        print "Iteration: ", i
+                        print "Iteration: ", i, evaluator.status()
                     features_batch = features[i:i+1]
                     init_pred_batch = init_pred_feat[i:i+1]
+                    beam_scores = {}
                     pathProbs = []
                     for k in range(K):
                         pathProbs.append(1.0)
@@ -301,14 +303,30 @@ class CaptioningSolver(object):
                             break
                         paths_info = newPaths_info
                         pathProbs = newPathProbs
+                        for beam, beam_prob in zip(paths_info, pathProbs):
+                            beam_scores[tuple(beam[0])] = beam_prob
                         # print pathProbs
                     all_sam_cap.append(paths_info[0][0])
+                    # beam score of every prefix of the path, i.e. of each label in decoding order
+                    all_sam_scores.append([beam_scores[tuple(all_sam_cap[-1][:m+1])] for m in range(len(all_sam_cap[-1]))])
+                    evaluator.update(all_sam_cap[-1:])
                     alphas = paths_info[0][3]
                     alpha_list = np.transpose(alphas, (1, 0, 2))     # (N, T, L)
                     all_alphas.append(alpha_list)
                 all_decoded = decode_py_captions(all_sam_cap, self.model.idx_to_word)
-                save_pickle(all_sam_cap, "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % \
-                            (split, split, filename, THRES))
+                candidate_file = "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % (split, split, filename, THRES)
+                if save_sampled_captions:
+                    save_pickle(all_sam_cap, candidate_file)
+                    save_pickle(zip(all_sam_cap, all_sam_scores), "./cocodata/%s/%s.ranked.captions_%s_%s.pkl" % \
+                                (split, split, filename, THRES))
+                metrics = evaluator.metrics()
+                metrics['seconds'] = time.time() - evaluator.start_t
+                write_result("./cocodata/%s/result_%s_%s.txt" % (split, filename, THRES), metrics)
+                record_runs('./cocodata/results.db', split, [parse_run_name(candidate_file) + (metrics,)], [candidate_file])
+                print format_metrics(metrics)
+                ranking = ranking_metrics(pad_rankings(all_sam_cap), evaluator.ref_counts)
+                write_ranking("./cocodata/%s/ranking_%s_%s.txt" % (split, filename, THRES), ranking)
+                print 'R@3: %.4f' % ranking['r@3']
                 print "Time cost: ", time.time()- start_t
 
             image_file_name = 'visualization/'
@@ -318,7 +336,7 @@ class CaptioningSolver(object):
                 # plt.rcParams['figure.cmap'] = 'gray'
                 num_samples = len(all_decoded)
                 ran_arr = np.random.randint(num_samples, size=10)
-                reference = load_pickle('./cocodata/val/val.references.pkl')
+                reference = load_coco_references(data_path='./cocodata', split='val')
                 sample_file = open('sample.txt', 'w')
                 sample_file.write('Grountruth:\n')
                 for idx in ran_arr:
@@ -11,6 +11,8 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_coco import *
+from metrics import *
+from results_db import *
 from tqdm import tqdm
 
 
@@ -131,10 +133,7 @@ class CaptioningSolver(object):
 
                     # groundtruth, logits_mask and end_time
                     groundtruth = np.zeros((n_examples, self.V), dtype=np.float32)
-                    for n, caption in enumerate(captions):
-                        for index in caption:
-                            if index > 2:
-                                groundtruth[n][index] = 1.0
+                    groundtruth[:, 3:] = label_matrix(self.data, self.V - 3)
 
                     label_num = np.sum(groundtruth, axis=1)
                     image_idxs = self.data['image_idxs']
@@ -198,74 +197,9 @@ class CaptioningSolver(object):
         return array
 
     def evaluate(self, candidate, thres, resultFile):
-        candidate = np.array(candidate)
-        candidate = np.transpose(candidate, (1, 0, 2))
-        reference = load_pickle('cocodata/val/val.references.pkl')
-        for key, value in reference.iteritems():
-            reference[key] = [int(idx) for idx in value[0].split()[:-1]]
-        g = open(resultFile, 'w')
-
-        word_to_idx = load_word2idx(data_path='/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata', split='train')
-        idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
-
-        for iter_num, iteration in enumerate(candidate):
-            refsNum = 0
-            cansNum = 0
-            correctNum = 0
-            classwise_num = np.zeros((3,80))
-            num = 0
-            for i in range(len(iteration)):
-                cans = []
-                for j, label in enumerate(iteration[i]):
-                    if label > thres:
-                        cans.append(j)
-                if len(cans) == 0:
-                    cans.append(int(np.argmax(iteration[i])))
-                cansNum += len(cans)
-                refs = reference[i]
-                refsNum += len(refs)
-                refsDict = {}
-                correct = 0
-                can_str = []
-                ref_str = []
-                for c in cans:
-                    can_str.append(idx_to_word[c])
-                for r in refs:
-                    ref_str.append(idx_to_word[r])
-                for c in cans:
-                    refsDict[c] = 0  # follow idx of word_to_idx (keep 0, 1, 2)
-                    classwise_num[0][c] += 1.0 # idx start from 0 for convenience
-                for r in refs:
-                    refsDict[r] = 1
-                    classwise_num[1][r] += 1.0
-                for c in cans:
-                    if refsDict[c] == 1:
-                        correct += 1
-                        classwise_num[2][c] += 1.0
-                correctNum += correct
-            recall = float(correctNum)/float(refsNum)
-            precision = float(correctNum)/float(cansNum)
-            o_f1 = 2.0/((1.0/recall) + (1.0/precision))
-            for i in range(len(classwise_num[0])):
-                if classwise_num[0][i] == 0.0:
-                    classwise_num[0][i] = 1.0
-            for i in range(len(classwise_num[1])):
-                if classwise_num[1][i] == 0.0:
-                    classwise_num[1][i] = 1.0
-            recall_arr = classwise_num[2] / classwise_num[1]
-            precision_arr = classwise_num[2] / classwise_num[0]
-            # precision_arr = np.divide(classwise_num[2], classwise_num[0])
-            c_recall = np.mean(recall_arr)
-            c_precision = np.mean(precision_arr)
-            c_f1 = 2.0/((1.0/c_recall) + (1.0/c_precision))
-            g.write('Iteration: ' + str(iter_num+1) + '\n')
-            g.write('O-R: ' + str(recall) + '\n')
-            g.write('O-P: ' + str(precision) + '\n')
-            g.write('O-F1: ' + str(o_f1) + '\n')
-            g.write('C-R: ' + str(c_recall) + '\n')
-            g.write('C-P: ' + str(c_precision) + '\n')
-            g.write('C-F1: ' + str(c_f1) + '\n')
-            g.write('Average: ' + str((c_f1+o_f1)/2) + '\n\n')
+        candidate = np.transpose(np.array(candidate), (1, 0, 2))
+        reference = reference_labels(load_coco_references(data_path='cocodata', split='val'))
+        write_iteration_results(resultFile, candidate, label_counts(reference, 80), thres)
 
     def test(self, split='train', attention_visualization=True, save_sampled_captions=True,\
              filename='', thres=0.0):
@@ -292,6 +226,8 @@ class CaptioningSolver(object):
             MAX_LEN = 5
             K = 3 # beam search width
             all_sam_cap = []
+            all_sam_scores = []
+            evaluator = StreamingEvaluator(label_counts(reference_labels(load_coco_references(data_path='./cocodata', split=split)), 80))
             all_alphas = []
             if split == 'val':
                 part_num = 1
@@ -310,6 +246,7 @@ class CaptioningSolver(object):
                 for i in tqdm(range(num_iter)):
                     features_batch = features[i:i+1]
                     init_pred_batch = init_pred[i:i+1]
+                    beam_scores = {}
                     pathProbs = []
                     for k in range(K):
                         pathProbs.append(1.0)
@@ -366,20 +303,38 @@ class CaptioningSolver(object):
                             break
                         paths_info = newPaths_info
                         pathProbs = newPathProbs
+                        for beam, beam_prob in zip(paths_info, pathProbs):
+                            beam_scores[tuple(beam[0])] = beam_prob
                     all_sam_cap.append(paths_info[0][0])
+                    # beam score of every prefix of the path, i.e. of each label in decoding order
+                    all_sam_scores.append([beam_scores[tuple(all_sam_cap[-1][:m+1])] for m in range(len(all_sam_cap[-1]))])
+                    evaluator.update(all_sam_cap[-1:])
+                    if i % 50 == 0:
+                        tqdm.write(evaluator.status())
                     alphas = paths_info[0][3]
                     alpha_list = np.transpose(alphas, (1, 0, 2))     # (N, T, L)
                     all_alphas.append(alpha_list)
             all_decoded = decode_py_captions(all_sam_cap, self.model.idx_to_word)
-            save_pickle(all_sam_cap, "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % \
-                        (split, split, filename, THRES))
+            candidate_file = "./cocodata/%s/%s.candidate.captions_%s_%s.pkl" % (split, split, filename, THRES)
+            if save_sampled_captions:
+                save_pickle(all_sam_cap, candidate_file)
+                save_pickle(zip(all_sam_cap, all_sam_scores), "./cocodata/%s/%s.ranked.captions_%s_%s.pkl" % \
+                            (split, split, filename, THRES))
+            metrics = evaluator.metrics()
+            metrics['seconds'] = time.time() - evaluator.start_t
+            write_result("./cocodata/%s/result_%s_%s.txt" % (split, filename, THRES), metrics)
+            record_runs('./cocodata/results.db', split, [parse_run_name(candidate_file) + (metrics,)], [candidate_file])
+            print format_metrics(metrics)
+            ranking = ranking_metrics(pad_rankings(all_sam_cap), evaluator.ref_counts)
+            write_ranking("./cocodata/%s/ranking_%s_%s.txt" % (split, filename, THRES), ranking)
+            print 'R@3: %.4f' % ranking['r@3']
             print "Time cost: ", time.time()- start_t
 
             image_file_name = 'visualization/'
             if attention_visualization:
                 num_samples = len(all_decoded)
                 ran_arr = np.random.randint(num_samples, size=10)
-                reference = load_pickle('./cocodata/val/val.references.pkl')
+                reference = load_coco_references(data_path='./cocodata', split='val')
                 sample_file = open('sample.txt', 'w')
                 sample_file.write('Grountruth:\n')
                 for idx in ran_arr:
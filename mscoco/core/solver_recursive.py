@@ -8,6 +8,7 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_coco import *
+from metrics import *
 
 
 class CaptioningSolver(object):
@@ -127,10 +128,7 @@ class CaptioningSolver(object):
 
                     # groundtruth, logits_mask and end_time
                     groundtruth = np.zeros((n_examples, self.V), dtype=np.float32)
-                    for n, caption in enumerate(captions):
-                        for index in caption:
-                            if index > 2:
-                                groundtruth[n][index] = 1.0
+                    groundtruth[:, 3:] = label_matrix(self.data, self.V - 3)
 
                     label_num = np.sum(groundtruth, axis=1)
                     image_idxs = self.data['image_idxs']
@@ -195,68 +193,9 @@ class CaptioningSolver(object):
         return array
 
     def evaluate(self, candidate, thres, resultFile):
-        candidate = np.array(candidate)
-        candidate = np.transpose(candidate, (1, 0, 2))
-        reference = load_pickle('cocodata/val/val.references.pkl')
-        for key, value in reference.iteritems():
-            reference[key] = [int(idx) for idx in value[0].split()[:-1]]
-        g = open(resultFile, 'w')
-
-        word_to_idx = load_word2idx(data_path='/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata', split='train')
-        idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
-
-        for iter_num, iteration in enumerate(candidate):
-            refsNum = 0
-            cansNum = 0
-            correctNum = 0
-            classwise_num = np.zeros((3,80))
-            num = 0
-            for i in range(len(iteration)):
-                cans = []
-                for j, label in enumerate(iteration[i]):
-                    if label > thres:
-                        cans.append(j)
-                if len(cans) == 0:
-                    cans.append(int(np.argmax(iteration[i])))
-                cansNum += len(cans)
-                refs = reference[i]
-                refsNum += len(refs)
-                refsDict = {}
-                correct = 0
-                for c in cans:
-                    refsDict[c] = 0  # follow idx of word_to_idx (keep 0, 1, 2)
-                    classwise_num[0][c] += 1.0 # idx start from 0 for convenience
-                for r in refs:
-                    refsDict[r] = 1
-                    classwise_num[1][r] += 1.0
-                for c in cans:
-                    if refsDict[c] == 1:
-                        correct += 1
-                        classwise_num[2][c] += 1.0
-                correctNum += correct
-            recall = float(correctNum)/float(refsNum)
-            precision = float(correctNum)/float(cansNum)
-            o_f1 = 2.0/((1.0/recall) + (1.0/precision))
-            for i in range(len(classwise_num[0])):
-                if classwise_num[0][i] == 0.0:
-                    classwise_num[0][i] = 1.0
-            for i in range(len(classwise_num[1])):
-                if classwise_num[1][i] == 0.0:
-                    classwise_num[1][i] = 1.0
-            recall_arr = classwise_num[2] / classwise_num[1]
-            precision_arr = classwise_num[2] / classwise_num[0]
-            # precision_arr = np.divide(classwise_num[2], classwise_num[0])
-            c_recall = np.mean(recall_arr)
-            c_precision = np.mean(precision_arr)
-            c_f1 = 2.0/((1.0/c_recall) + (1.0/c_precision))
-            g.write('Iteration: ' + str(iter_num+1) + '\n')
-            g.write('O-R: ' + str(recall) + '\n')
-            g.write('O-P: ' + str(precision) + '\n')
-            g.write('O-F1: ' + str(o_f1) + '\n')
-            g.write('C-R: ' + str(c_recall) + '\n')
-            g.write('C-P: ' + str(c_precision) + '\n')
-            g.write('C-F1: ' + str(c_f1) + '\n')
-            g.write('Average: ' + str((c_f1+o_f1)/2) + '\n\n')
+        candidate = np.transpose(np.array(candidate), (1, 0, 2))
+        reference = reference_labels(load_coco_references(data_path='cocodata', split='val'))
+        write_iteration_results(resultFile, candidate, label_counts(reference, 80), thres)
 
     def test(self, data, split='train', attention_visualization=True, save_sampled_captions=True,\
              filename='', thres=0.0):
@@ -350,7 +289,7 @@ class CaptioningSolver(object):
                 # plt.rcParams['figure.cmap'] = 'gray'
                 num_samples = len(all_decoded)
                 ran_arr = np.random.randint(num_samples, size=10)
-                reference = load_pickle('./cocodata/val/val.references.pkl')
+                reference = load_coco_references(data_path='./cocodata', split='val')
                 sample_file = open('sample.txt', 'w')
                 sample_file.write('Grountruth:\n')
                 for idx in ran_arr:
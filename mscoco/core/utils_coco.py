@@ -3,6 +3,11 @@ import cPickle as pickle
 import hickle
 import time
 import os
+import json
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 def load_word_to_idx(data_path='./cocodata', split='train'):
     data_path = os.path.join(data_path, split)
@@ -24,36 +29,81 @@ def load_word2idx(data_path='./cocodata', split='train'):
     print "Elapse time: %.2f" %(end_t - start_t)
     return word
 
-def load_coco_data(data_path='./cocodata', split='train', part='', load_init_pred=False):
+def _load_dataset(path):
+    # columnar split written by prepro_coco.py: one npz instead of one pickle per array
+    dataset = np.load(path)
+    return {'file_names': dataset['file_names'],
+            'captions': dataset['captions'],
+            'image_idxs': dataset['image_idxs'],
+            'label_offsets': dataset['label_offsets'],
+            'label_values': dataset['label_values'],
+            'labels': dataset['labels']}
+
+def load_coco_data(data_path='./cocodata', split='train', part='', load_init_pred=False, features='features'):
+    # features names the feature files, e.g. 'features_pca256' for the ones written by prepro_pca.py
     data_path = os.path.join(data_path, split)
     start_t = time.time()
     data = {}
     if split in ['train', 'test']:
-        data['features'] = hickle.load(os.path.join(data_path, '%s.features_%s.hkl' % (split, part)))
+        data['features'] = hickle.load(os.path.join(data_path, '%s.%s_%s.hkl' % (split, features, part)))
         if load_init_pred == True:
             data['init_pred'] = hickle.load(os.path.join(data_path, '%s.init.pred_%s.hkl' % (split, part)))
-        with open(os.path.join(data_path, '%s.file.names_%s.pkl' % (split, part)), 'rb') as f:
-            data['file_names'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.captions_%s.pkl' % (split, part)), 'rb') as f:
-            data['captions'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.image.idxs_%s.pkl' % (split, part)), 'rb') as f:
-            data['image_idxs'] = pickle.load(f)
+        dataset_path = os.path.join(data_path, '%s.dataset_%s.npz' % (split, part))
+        if os.path.exists(dataset_path):
+            data.update(_load_dataset(dataset_path))
+        else:
+            with open(os.path.join(data_path, '%s.file.names_%s.pkl' % (split, part)), 'rb') as f:
+                data['file_names'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.captions_%s.pkl' % (split, part)), 'rb') as f:
+                data['captions'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.image.idxs_%s.pkl' % (split, part)), 'rb') as f:
+                data['image_idxs'] = pickle.load(f)
         # with open(os.path.join(data_path, 'word_to_idx.pkl'), 'rb') as f:
         #     data['word_to_idx'] = pickle.load(f)
     else:
-        data['features'] = hickle.load(os.path.join(data_path, '%s.features.hkl' % split))
+        data['features'] = hickle.load(os.path.join(data_path, '%s.%s.hkl' % (split, features)))
         if load_init_pred == True:
             data['init_pred'] = hickle.load(os.path.join(data_path, '%s.init.pred.hkl' % split))
-        with open(os.path.join(data_path, '%s.file.names.pkl' %split), 'rb') as f:
-            data['file_names'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.captions.pkl' %split), 'rb') as f:
-            data['captions'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.image.idxs.pkl' %split), 'rb') as f:
-            data['image_idxs'] = pickle.load(f)
+        dataset_path = os.path.join(data_path, '%s.dataset.npz' % split)
+        if os.path.exists(dataset_path):
+            data.update(_load_dataset(dataset_path))
+        else:
+            with open(os.path.join(data_path, '%s.file.names.pkl' %split), 'rb') as f:
+                data['file_names'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.captions.pkl' %split), 'rb') as f:
+                data['captions'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.image.idxs.pkl' %split), 'rb') as f:
+                data['image_idxs'] = pickle.load(f)
     end_t = time.time()
     # print "Elapse time: %.2f" %(end_t - start_t)
     return data
 
+def load_coco_references(data_path='./cocodata', split='val', part=''):
+    # returns {image_idx: [reference caption, ...]} like the old %s.references.pkl files
+    data_path = os.path.join(data_path, split)
+    suffix = '_%s' % part if part != '' else ''
+    dataset_path = os.path.join(data_path, '%s.dataset%s.npz' % (split, suffix))
+    if not os.path.exists(dataset_path):
+        return load_pickle(os.path.join(data_path, '%s.references%s.pkl' % (split, suffix)))
+    dataset = np.load(dataset_path)
+    references = dataset['references']
+    offsets = dataset['reference_offsets']
+    return dict((i, list(references[offsets[i]:offsets[i+1]])) for i in range(len(offsets) - 1))
+
+def reference_labels(references):
+    # 0-based class ids of each image, in image order, from load_coco_references ('l1 l2 .')
+    return [[int(idx) for idx in references[i][0].split()[:-1]] for i in range(len(references))]
+
+def label_matrix(data, n_classes=80):
+    # multi-hot ground truth of shape (n_captions, n_classes); label = word index - 3
+    if 'labels' in data:
+        return np.unpackbits(data['labels'], axis=1)[:, :n_classes].astype(np.float32)
+    # old pickled splits only carry the padded captions
+    captions = data['captions']
+    multi_hot = np.zeros((len(captions), n_classes + 3), dtype=np.float32)
+    multi_hot[np.arange(len(captions))[:, None], captions] = 1.0
+    return multi_hot[:, 3:]
+
 def decode_captions(captions, idx_to_word):
     # for i in idx_to_word.iteritems():
     #     print i
@@ -115,6 +165,35 @@ def write_bleu(scores, path, epoch):
         f.write('ROUGE_L: %f\n' %scores['ROUGE_L'])  
         f.write('CIDEr: %f\n\n' %scores['CIDEr'])
 
+def iter_json_arrays(path, keys):
+    # yields (key, element) for the elements of the top-level arrays in keys from a single pass
+    # over the file (in file order), so a large annotation file is neither held as a whole
+    # object tree nor parsed once per array; without ijson this falls back to one json.load
+    # and yields the arrays in the order of keys
+    if ijson is None:
+        with open(path) as f:
+            data = json.load(f)
+        for key in keys:
+            for item in data[key]:
+                yield key, item
+        return
+    prefixes = dict(('%s.item' % key, key) for key in keys)
+    with open(path, 'rb') as f:
+        events = ijson.parse(f)
+        for prefix, event, value in events:
+            if prefix not in prefixes:
+                continue
+            if event not in ('start_map', 'start_array'):
+                yield prefixes[prefix], value
+                continue
+            # rebuild the element from its events up to the matching end event
+            builder = ijson.common.ObjectBuilder()
+            item_prefix, end_event = prefix, event.replace('start', 'end')
+            while (prefix, event) != (item_prefix, end_event):
+                builder.event(event, value)
+                prefix, event, value = next(events)
+            yield prefixes[item_prefix], builder.value
+
 def load_pickle(path):
     with open(path, 'rb') as f:
         file = pickle.load(f)
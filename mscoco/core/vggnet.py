@@ -1,5 +1,7 @@
 import tensorflow as tf
+import numpy as np
 import scipy.io
+import sys
 
 
 vgg_layers = ['conv1_1', 'relu1_1', 'conv1_2', 'relu1_2', 'pool1',
@@ -8,14 +10,36 @@ vgg_layers = ['conv1_1', 'relu1_1', 'conv1_2', 'relu1_2', 'pool1',
               'conv4_1', 'relu4_1', 'conv4_2', 'relu4_2', 'conv4_3', 'relu4_3', 'conv4_4', 'relu4_4', 'pool4',
               'conv5_1', 'relu5_1', 'conv5_2', 'relu5_2', 'conv5_3', 'relu5_3', 'conv5_4', 'relu5_4']
 
+def convert_vgg_mat(mat_path, npz_path):
+    # one-time conversion of imagenet-vgg-verydeep-19.mat to an npz holding only the conv layers
+    # build_model uses ('conv1_1/w', 'conv1_1/b', ...; the fc layers are dropped), already in the
+    # layout build_params uses
+    model = scipy.io.loadmat(mat_path)
+    layers = model['layers'][0]
+    params = {}
+    for layer in layers:
+        layer_name = layer[0][0][0][0]
+        layer_type = layer[0][0][1][0]
+        if layer_type == 'conv' and layer_name in vgg_layers:
+            params[layer_name+'/w'] = layer[0][0][2][0][0].transpose(1, 0, 2, 3)
+            params[layer_name+'/b'] = layer[0][0][2][0][1].reshape(-1)
+    np.savez(npz_path, **params)
+    print ('Saved %s..' % npz_path)
+
+
 class Vgg19(object):
     def __init__(self, vgg_path):
+        # vgg_path is the original .mat file or an npz written by convert_vgg_mat; with an npz
+        # the weights are not embedded in the graph, call load_params(sess) after initializing
         self.vgg_path = vgg_path
 
     def build_inputs(self):
         self.images = tf.placeholder(tf.float32, [None, 224, 224, 3], 'images')
 
     def build_params(self):
+        if self.vgg_path.endswith('.npz'):
+            self.build_params_npz()
+            return
         model = scipy.io.loadmat(self.vgg_path)
         layers = model['layers'][0]
         self.params = {}
@@ -30,6 +54,32 @@ class Vgg19(object):
                     self.params[layer_name]['w'] = tf.get_variable(layer_name+'/w', initializer=tf.constant(w))
                     self.params[layer_name]['b'] = tf.get_variable(layer_name+'/b',initializer=tf.constant(b))
 
+    def build_params_npz(self):
+        # variables start at zero and are filled through placeholders by load_params, so the
+        # GraphDef stays small
+        self.weights = dict(np.load(self.vgg_path))
+        self.params = {}
+        self.assign_ops = []
+        self.assign_feeds = {}
+        with tf.variable_scope('encoder'):
+            for layer_name in vgg_layers:
+                if layer_name[:4] != 'conv':
+                    continue
+                self.params[layer_name] = {}
+                for key in ['w', 'b']:
+                    value = self.weights[layer_name+'/'+key]
+                    var = tf.get_variable(layer_name+'/'+key, shape=value.shape,
+                                          initializer=tf.constant_initializer(0.0))
+                    feed = tf.placeholder(tf.float32, value.shape)
+                    self.params[layer_name][key] = var
+                    self.assign_ops.append(tf.assign(var, feed))
+                    self.assign_feeds[feed] = value
+
+    def load_params(self, sess):
+        # no-op for .mat models, whose weights are the variables' initializers
+        if self.vgg_path.endswith('.npz'):
+            sess.run(self.assign_ops, feed_dict=self.assign_feeds)
+
     def _conv(self, x, w, b):
         return tf.nn.bias_add(tf.nn.conv2d(x, w, strides=[1, 1, 1, 1], padding='SAME'), b)
 
@@ -57,4 +107,9 @@ class Vgg19(object):
     def build(self):
         self.build_inputs()
         self.build_params()
-        self.build_model()
\ No newline at end of file
+        self.build_model()
+
+
+if __name__ == "__main__":
+    # python -m core.vggnet imagenet-vgg-verydeep-19.mat imagenet-vgg-verydeep-19.npz
+    convert_vgg_mat(sys.argv[1], sys.argv[2])
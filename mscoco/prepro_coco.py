@@ -11,38 +11,41 @@ import os
 import json
 import math
 import random
+import itertools
 os.environ['CUDA_VISIBLE_DEVICES']='1'
 
+# punctuation stripped from (or rewritten in) every caption, applied in a single translate pass
+_caption_table = dict((ord(c), None) for c in u'.,\'"()')
+_caption_table[ord(u'&')] = u'and'
+_caption_table[ord(u'-')] = u' '
+
 def _process_caption_data(caption_file, image_dir, max_length):
-    with open(caption_file) as f:
-        caption_data = json.load(f)
-    # print (caption_data['annotations'])
-    # id_to_filename is a dictionary such as {image_id: filename]} 
-    id_to_filename = {image['id']: image['file_name'] for image in caption_data['images']}
-    # data is a list of dictionary which contains 'captions', 'file_name' and 'image_id' as key.
-    data = []
-    for annotation in caption_data['annotations']:
-        image_id = annotation['image_id']
-        annotation['file_name'] = os.path.join(image_dir, id_to_filename[image_id])
-        data += [annotation]
+    # images and annotations come from one pass over the file; file names are looked up once
+    # both are read, whichever array comes first. id_to_filename is {image_id: filename}
+    id_to_filename = {}
+    captions = []
+    image_ids = []
+    for key, item in iter_json_arrays(caption_file, ['images', 'annotations']):
+        if key == 'images':
+            id_to_filename[item['id']] = item['file_name']
+        else:
+            captions.append(item['caption'])
+            image_ids.append(item['image_id'])
+    file_names = [os.path.join(image_dir, id_to_filename[image_id]) for image_id in image_ids]
     # convert to pandas dataframe (for later visualization or debugging)
-    caption_data = pd.DataFrame.from_dict(data)
-    del caption_data['id']
+    caption_data = pd.DataFrame({'caption': captions, 'file_name': file_names, 'image_id': image_ids},
+                                columns=['caption', 'file_name', 'image_id'])
     # caption_data.sort_values(by='image_id', inplace=True)
     # caption_data = caption_data.reset_index(drop=True)   
-    del_idx = []
-    for i, caption in enumerate(caption_data['caption']):
-        caption = caption.replace('.','').replace(',','').replace("'","").replace('"','')
-        caption = caption.replace('&','and').replace('(','').replace(")","").replace('-',' ')
-        caption = " ".join(caption.split())  # replace multiple spaces
-        
-        caption_data.set_value(i, 'caption', caption.lower())
-        if len(caption.split(" ")) > max_length:
-            del_idx.append(i)
-    
+    captions = caption_data['caption'].str.translate(_caption_table)
+    captions = captions.str.split().str.join(u' ').str.lower()  # replace multiple spaces
+    # captions are single-space separated now, so word count is space count + 1
+    keep = captions.str.count(u' ') < max_length
+    caption_data['caption'] = captions
+
     # delete captions if size is larger than max_length
     print "The number of captions before deletion: %d" %len(caption_data)
-    caption_data = caption_data.drop(caption_data.index[del_idx])
+    caption_data = caption_data[keep]
     caption_data = caption_data.reset_index(drop=True)
     print "The number of captions after deletion: %d" %len(caption_data)
     return caption_data
@@ -71,51 +74,72 @@ def _build_vocab(annotations, threshold=1):
     return word_to_idx
 
 
+def _build_word_idxs(annotations, word_to_idx):
+    # flat vocabulary indices of every known word; caption i owns word_idxs[offsets[i]:offsets[i+1]]
+    words = annotations['caption'].str.split(' ') # caption contrains only lower-case words
+    rows = np.repeat(np.arange(len(words)), words.str.len().values.astype(np.int64))
+    word_idxs = pd.Series(list(itertools.chain.from_iterable(words)), dtype=object).map(word_to_idx)
+    known = word_idxs.notnull().values
+    offsets = np.zeros(len(words) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum(np.bincount(rows[known], minlength=len(words)))
+    return offsets, word_idxs.values[known].astype(np.int32)
+
+
 def _build_caption_vector(annotations, word_to_idx, max_length=15):
-    n_examples = len(annotations)
-    captions = np.ndarray((n_examples,max_length+2)).astype(np.int32)   
+    offsets, word_idxs = _build_word_idxs(annotations, word_to_idx)
+    n_examples = len(offsets) - 1
+    lengths = np.diff(offsets)
 
-    for i, caption in enumerate(annotations['caption']):
-        words = caption.split(" ") # caption contrains only lower-case words
-        cap_vec = []
-        cap_vec.append(word_to_idx['<START>'])
-        for word in words:
-            if word in word_to_idx:
-                cap_vec.append(word_to_idx[word])
-        cap_vec.append(word_to_idx['<END>'])
-        
-        # pad short caption with the special null token '<NULL>' to make it fixed-size vector
-        if len(cap_vec) < (max_length + 2):
-            for j in range(max_length + 2 - len(cap_vec)):
-                cap_vec.append(word_to_idx['<NULL>']) 
-        
-        captions[i, :] = np.asarray(cap_vec)
+    # <START>, the words, <END>, then <NULL> padding up to a fixed-size vector
+    captions = np.full((n_examples, max_length+2), word_to_idx['<NULL>'], dtype=np.int32)
+    captions[:, 0] = word_to_idx['<START>']
+    rows = np.repeat(np.arange(n_examples), lengths)
+    cols = np.arange(len(word_idxs)) - np.repeat(offsets[:-1], lengths) + 1
+    captions[rows, cols] = word_idxs
+    captions[np.arange(n_examples), lengths + 1] = word_to_idx['<END>']
     print "Finished building caption vectors"
     return captions
 
 
-def _build_file_names(annotations):
-    image_file_names = []
-    id_to_idx = {}
-    idx = 0
-    image_ids = annotations['image_id']
-    file_names = annotations['file_name']
-    for image_id, file_name in zip(image_ids, file_names):
-        if not image_id in id_to_idx:
-            id_to_idx[image_id] = idx
-            image_file_names.append(file_name)
-            idx += 1
+def _build_label_sets(annotations, word_to_idx):
+    # labels drop the <NULL>, <START> and <END> slots, so label = word index - 3
+    offsets, word_idxs = _build_word_idxs(annotations, word_to_idx)
+    n_classes = len(word_to_idx) - 3
+    labels = word_idxs - 3
+    multi_hot = np.zeros((len(offsets) - 1, n_classes), dtype=np.uint8)
+    multi_hot[np.repeat(np.arange(len(offsets) - 1), np.diff(offsets)), labels] = 1
+    label_dtype = np.int8 if n_classes <= np.iinfo(np.int8).max else np.int16
+    return offsets, labels.astype(label_dtype), np.packbits(multi_hot, axis=1), n_classes
+
 
-    file_names = np.asarray(image_file_names)
-    return file_names, id_to_idx
+def _build_dataset(annotations, word_to_idx, max_length=15):
+    # image_idxs follow the first appearance of each image_id in the split
+    image_idxs, _ = pd.factorize(annotations['image_id'])
+    first_idxs = np.unique(image_idxs, return_index=True)[1]
+    file_names = annotations['file_name'].values[first_idxs].astype(np.unicode_)
+    captions = _build_caption_vector(annotations=annotations, word_to_idx=word_to_idx, max_length=max_length)
+    label_offsets, label_values, labels, n_classes = _build_label_sets(annotations, word_to_idx)
 
+    # reference captions grouped per image; image i owns references[offsets[i]:offsets[i+1]]
+    order = np.argsort(image_idxs, kind='mergesort')
+    references = (annotations['caption'].str.lower() + u' .').values[order].astype(np.unicode_)
+    reference_offsets = np.zeros(len(file_names) + 1, dtype=np.int32)
+    reference_offsets[1:] = np.cumsum(np.bincount(image_idxs, minlength=len(file_names)))
+    return {'captions': captions,
+            'file_names': file_names,
+            'image_idxs': image_idxs.astype(np.int32),
+            'label_offsets': label_offsets,
+            'label_values': label_values,
+            'labels': labels,
+            'n_classes': n_classes,
+            'references': references,
+            'reference_offsets': reference_offsets}
 
-def _build_image_idxs(annotations, id_to_idx):
-    image_idxs = np.ndarray(len(annotations), dtype=np.int32)
-    image_ids = annotations['image_id']
-    for i, image_id in enumerate(image_ids):
-        image_idxs[i] = id_to_idx[image_id]
-    return image_idxs
+
+def _save_dataset(annotations, word_to_idx, max_length, path):
+    # one columnar file per split replaces the captions, file.names, image.idxs and references pickles
+    np.savez(path, **_build_dataset(annotations, word_to_idx, max_length))
+    print ('Saved %s..' %path)
 
 def main():
     config = tf.ConfigProto()
@@ -127,7 +151,8 @@ def main():
     # if word occurs less than word_count_threshold in training dataset, the word index is special unknown token.
     word_count_threshold = 1
     # vgg model path 
-    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.mat'
+    # conv weights converted once from imagenet-vgg-verydeep-19.mat with python -m core.vggnet
+    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.npz'
 
     # about 80000 images and 400000 captions for train dataset
     train_data = _process_caption_data(caption_file='/home/jason6582/sfyc/mscoco/annotations/train_resize.json',
@@ -144,64 +169,25 @@ def main():
     part_num = 20
     for i in range(part_num-1):
         train_cutoff.append(int(len(train_data)/part_num)*(i+1))
-    for i in range(part_num-1):
-        save_pickle(train_data[train_cutoff[i]:train_cutoff[i+1]],
-                'cocodata/train/train.annotations_%s.pkl' % str(i))
-    save_pickle(train_data[train_cutoff[part_num-1]:], \
-                'cocodata/train/train.annotations_%s.pkl' %(part_num-1))
-    save_pickle(val_data, 'cocodata/val/val.annotations.pkl')
-    save_pickle(test_data, 'cocodata/test/test.annotations.pkl')
+    train_cutoff.append(len(train_data))
 
     word_to_idx = {u'<NULL>': 0, u'<START>': 1, u'<END>': 2}
     for i in range(80):
         word_to_idx[str(i)] = i + 3
     save_pickle(word_to_idx, './cocodata/train/word_to_idx.pkl')
+
+    # each part is built straight from the in-memory annotations; the annotation pickles
+    # are still written because the feature extractors read file names from them
     split = 'train'
     for part in range(part_num):
-        annotations = load_pickle('./cocodata/%s/%s.annotations_%s.pkl' % (split, split, str(part)))
-        captions = _build_caption_vector(annotations=annotations, word_to_idx=word_to_idx, max_length=max_length)
-        save_pickle(captions, './cocodata/%s/%s.captions_%s.pkl' % (split, split, str(part)))
-
-        file_names, id_to_idx = _build_file_names(annotations)
-        save_pickle(file_names, './cocodata/%s/%s.file.names_%s.pkl' % (split, split, str(part)))
-
-        image_idxs = _build_image_idxs(annotations, id_to_idx)
-        save_pickle(image_idxs, './cocodata/%s/%s.image.idxs_%s.pkl' % (split, split, str(part)))
-
-        # prepare reference captions to compute bleu scores later
-        image_ids = {}
-        feature_to_captions = {}
-        i = -1
-        for caption, image_id in zip(annotations['caption'], annotations['image_id']):
-            if not image_id in image_ids:
-                image_ids[image_id] = 0
-                i += 1
-                feature_to_captions[i] = []
-            feature_to_captions[i].append(caption.lower() + ' .')
-        save_pickle(feature_to_captions, './cocodata/%s/%s.references_%s.pkl' % (split, split, str(part)))
+        annotations = train_data[train_cutoff[part]:train_cutoff[part+1]]
+        save_pickle(annotations, './cocodata/%s/%s.annotations_%s.pkl' % (split, split, str(part)))
+        _save_dataset(annotations, word_to_idx, max_length,
+                      './cocodata/%s/%s.dataset_%s.npz' % (split, split, str(part)))
         print "Finished building %s caption dataset" %split
-    for split in ['val', 'test']:
-        annotations = load_pickle('./cocodata/%s/%s.annotations.pkl' % (split, split))
-        captions = _build_caption_vector(annotations=annotations, word_to_idx=word_to_idx, max_length=max_length)
-        save_pickle(captions, './cocodata/%s/%s.captions.pkl' % (split, split))
-
-        file_names, id_to_idx = _build_file_names(annotations)
-        save_pickle(file_names, './cocodata/%s/%s.file.names.pkl' % (split, split))
-
-        image_idxs = _build_image_idxs(annotations, id_to_idx)
-        save_pickle(image_idxs, './cocodata/%s/%s.image.idxs.pkl' % (split, split))
-
-        # prepare reference captions to compute bleu scores later
-        image_ids = {}
-        feature_to_captions = {}
-        i = -1
-        for caption, image_id in zip(annotations['caption'], annotations['image_id']):
-            if not image_id in image_ids:
-                image_ids[image_id] = 0
-                i += 1
-                feature_to_captions[i] = []
-            feature_to_captions[i].append(caption.lower() + ' .')
-        save_pickle(feature_to_captions, './cocodata/%s/%s.references.pkl' % (split, split))
+    for split, annotations in [('val', val_data), ('test', test_data)]:
+        save_pickle(annotations, './cocodata/%s/%s.annotations.pkl' % (split, split))
+        _save_dataset(annotations, word_to_idx, max_length, './cocodata/%s/%s.dataset.npz' % (split, split))
         print "Finished building %s caption dataset" %split
     '''
     # extract conv5_3 feature vectors
@@ -209,6 +195,7 @@ def main():
     vggnet.build()
     with tf.Session() as sess:
         tf.initialize_all_variables().run()
+        vggnet.load_params(sess)
         split = 'train'
         part_num = 20
         for part in range(part_num):
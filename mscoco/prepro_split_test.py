@@ -127,7 +127,8 @@ def main():
     # if word occurs less than word_count_threshold in training dataset, the word index is special unknown token.
     word_count_threshold = 1
     # vgg model path 
-    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.mat'
+    # conv weights converted once from imagenet-vgg-verydeep-19.mat with python -m core.vggnet
+    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.npz'
 
     # about 80000 images and 400000 captions for train dataset
     train_data = _process_caption_data(caption_file='/home/jason6582/sfyc/mscoco/annotations/train_resize.json',
@@ -210,6 +211,7 @@ def main():
     vggnet.build()
     with tf.Session() as sess:
         tf.initialize_all_variables().run()
+        vggnet.load_params(sess)
         split = 'train'
         part_num = 20
         for part in range(part_num):
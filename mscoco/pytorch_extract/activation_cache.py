@@ -0,0 +1,24 @@
+from torch.autograd import Variable
+import os
+import numpy as np
+from image_loader import *
+
+
+def cache_activations(trunk, image_path, cache_path, row_shape, batch_size=128):
+    # run the frozen trunk over image_path once and keep its output in a .npy file; later
+    # calls (every other epoch) memory-map it instead of decoding and re-running the trunk
+    row_shape = tuple(row_shape)
+    if not os.path.exists(cache_path):
+        # the trunk runs in the caller's batch norm mode, train mode (batch statistics) like the
+        # uncached path and the extractors, so batch_size has to be the caller's as well
+        feats = np.lib.format.open_memmap(cache_path + '.tmp', mode='w+', dtype=np.float32,
+                                          shape=(len(image_path),) + row_shape)
+        end = 0
+        for image_batch in image_loader(image_path, batch_size):
+            start, end = end, end + image_batch.size(0)
+            image_var = Variable(image_batch.cuda(async=True), volatile=True)
+            feats[start:end] = np.reshape(trunk(image_var).data.cpu().numpy(), (-1,) + row_shape)
+        feats.flush()
+        del feats
+        os.rename(cache_path + '.tmp', cache_path)
+    return np.load(cache_path, mmap_mode='r')
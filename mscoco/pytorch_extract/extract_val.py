@@ -17,6 +17,8 @@ import torch.utils.data
 import torchvision.transforms as transforms
 import torchvision.datasets as dset
 import torchvision.models as models
+from image_loader import *
+from feature_writer import FeatureWriter
 os.environ['CUDA_VISIBLE_DEVICES'] = '1'
 
 resnet152 = models.resnet152(pretrained=True)
@@ -30,27 +32,18 @@ for split in ['val', 'test']:
                 % (split, split)
     save_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/feature_2048/%s/%s.features.hkl'\
                 % (split, split)
-    with open(anno_path, 'rb') as f:
-        annotations = pickle.load(f)
-    image_path = list(annotations['file_name'].unique())
+    image_path = load_image_path(anno_path)
     n_examples = len(image_path)
 
-    all_feats = np.ndarray([n_examples, 2048], dtype=np.float32)
-    for start, end in zip(range(0, n_examples, batch_size),
-                            range(batch_size, n_examples + batch_size, batch_size)):
-        image_batch_file = image_path[start:end]
-        image_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
-                image_batch_file)).astype(np.float32)
-        image_batch = np.transpose(image_batch, (0, 3, 1, 2))
-        image_batch = torch.Tensor(image_batch).cuda()
-        image_var = Variable(image_batch, volatile=True).cuda()
+    writer = FeatureWriter([save_path], [[2048]], n_examples)
+    for image_batch in image_loader(image_path[writer.n_done:], batch_size):
+        image_var = Variable(image_batch.cuda(async=True), volatile=True)
         feats = resnet152(image_var)
         feats = np.reshape(feats.data.cpu().numpy(), [-1, 2048])
         # feats = np.transpose(feats, (0, 2, 1))
-        all_feats[start:end, :] = feats
-        print ("Processed %d %s features.." % (end, split))
-        # use hickle to save huge feature vectors
-    hickle.dump(all_feats, save_path)
+        writer.append(feats)
+        print ("Processed %d %s features.." % (writer.n_done, split))
+    writer.close()
     print ("Saved %s.." % (save_path))
 
 '''
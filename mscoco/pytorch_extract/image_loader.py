@@ -0,0 +1,34 @@
+from scipy import ndimage
+import numpy as np
+import cPickle as pickle
+import torch
+import torch.utils.data
+
+
+class ImageListDataset(torch.utils.data.Dataset):
+    """Decodes the images of a split file list into (3, 224, 224) float tensors."""
+    def __init__(self, image_path):
+        self.image_path = image_path
+
+    def __len__(self):
+        return len(self.image_path)
+
+    def __getitem__(self, idx):
+        image = ndimage.imread(self.image_path[idx], mode='RGB').astype(np.float32)
+        return torch.from_numpy(np.ascontiguousarray(np.transpose(image, (2, 0, 1))))
+
+
+def image_loader(image_path, batch_size, num_workers=8):
+    # worker processes decode and prefetch the next batches while the network runs on the
+    # current one; pinned batches let .cuda(async=True) overlap the host-to-device copy
+    return torch.utils.data.DataLoader(ImageListDataset(image_path), batch_size=batch_size,
+                                       shuffle=False, num_workers=num_workers, pin_memory=True)
+
+
+def load_image_path(anno_path):
+    # unique image files of a split in feature order, from an annotations pickle or a dataset npz
+    if anno_path.endswith('.npz'):
+        return list(np.load(anno_path)['file_names'])
+    with open(anno_path, 'rb') as f:
+        annotations = pickle.load(f)
+    return list(annotations['file_name'].unique())
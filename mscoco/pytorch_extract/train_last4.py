@@ -4,6 +4,7 @@ sys.path.append('/home/jason6582/sfyc/attention-tensorflow/mscoco')
 from scipy import ndimage
 from torch.autograd import Variable
 from core.utils_coco import *
+from core.metrics import *
 import os
 import time
 import numpy as np
@@ -19,6 +20,7 @@ import torchvision.transforms as transforms
 import torchvision.datasets as dset
 import torchvision.models as models
 from tqdm import tqdm
+from activation_cache import cache_activations
 
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 # create a resnet module which doesn't have last three layer, output dim = (196, 1024)
@@ -58,6 +60,14 @@ optimizer = torch.optim.SGD(resnet.fc.parameters(),
                             weight_decay=1e-4)
 resnet = nn.DataParallel(resnet).cuda()
 
+# the trunk is frozen, so its (1024, 14, 14) output is computed once per part and the fc
+# stack is trained from the cached rows instead of decoding and re-running ResNet-152 every epoch
+# batch norm uses batch statistics, so the rows depend on batch_size: clear cache_dir when it changes
+use_cache = True
+cache_dir = '/home/jason6582/sfyc/attention-tensorflow/mscoco/activation_cache'
+trunk = nn.DataParallel(resnet.module.resnet152).cuda()
+head = resnet.module.fc
+
 # Training part
 print 'Training starts...'
 split = 'train'
@@ -82,26 +92,29 @@ for epoch in range(training_epoch):
         data_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata'
         data = load_coco_data(data_path=data_path, split='train', part=str(part))
         captions = data['captions']
-        groundtruth = np.zeros((n_examples, 80), dtype=np.float32)
-        for n, caption in enumerate(captions):
-            for index in caption:
-                if index > 2:
-                    groundtruth[n][index-3] = 1.0
+        groundtruth = label_matrix(data, 80)
+        if use_cache:
+            feats = cache_activations(trunk, image_path,
+                                      os.path.join(cache_dir, '%s.conv4_%s.npy' % (split, str(part))), [196 * 1024], batch_size)
 
         for start, end in zip(range(0, n_examples, batch_size),
                             range(batch_size, n_examples + batch_size, batch_size)):
-            image_batch_file = image_path[start:end]
-            input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
-                    image_batch_file))
-            input_batch = input_batch.astype(np.float32)
-            input_batch = np.transpose(input_batch, (0, 3, 1, 2))
-            input_batch = torch.Tensor(input_batch).cuda()
-            input_var = Variable(input_batch).cuda()
+            if use_cache:
+                input_var = Variable(torch.from_numpy(np.array(feats[start:end]))).cuda()
+                output = head(input_var)
+            else:
+                image_batch_file = image_path[start:end]
+                input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
+                        image_batch_file))
+                input_batch = input_batch.astype(np.float32)
+                input_batch = np.transpose(input_batch, (0, 3, 1, 2))
+                input_batch = torch.Tensor(input_batch).cuda()
+                input_var = Variable(input_batch).cuda()
+                output = resnet(input_var)
             groundtruth_batch = groundtruth[start:end]
             groundtruth_batch = torch.Tensor(groundtruth_batch).cuda()
             target_var = Variable(groundtruth_batch, requires_grad=False).cuda()
 
-            output = resnet(input_var)
             loss = criterion(output, target_var)
             part_loss += loss.data.cpu().numpy()[0]
             optimizer.zero_grad()
@@ -117,10 +130,6 @@ for epoch in range(training_epoch):
     if (epoch+1) % test_every == 0:
         # Load validation data first
         print 'Loading validation...'
-        reference = load_pickle('/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata/val/val.references.pkl')
-        for key, value in reference.iteritems():
-            reference[key] = [int(idx) for idx in value[0].split()[:-1]]
-
         anno_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata/val/val.annotations.pkl'
         with open(anno_path, 'rb') as f:
             annotations = pickle.load(f)
@@ -129,76 +138,28 @@ for epoch in range(training_epoch):
         data_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata'
         data = load_coco_data(data_path=data_path, split='val')
         captions = data['captions']
-        groundtruth = np.zeros((n_examples, 80), dtype=np.float32)
-        for n, caption in enumerate(captions):
-            for index in caption:
-                if index > 2:
-                    groundtruth[n][index-3] = 1.0
+        groundtruth = label_matrix(data, 80)
         all_preds = np.ndarray([n_examples, 80], dtype=np.float32)
+        if use_cache:
+            feats = cache_activations(trunk, image_path, os.path.join(cache_dir, 'val.conv4.npy'), [196 * 1024], batch_size)
         for start, end in zip(range(0, n_examples, batch_size),
                             range(batch_size, n_examples + batch_size, batch_size)):
-            image_batch_file = image_path[start:end]
-            input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
-                    image_batch_file))
-            input_batch = input_batch.astype(np.float32)
-            input_batch = np.transpose(input_batch, (0, 3, 1, 2))
-            input_batch = torch.Tensor(input_batch).cuda()
-            input_var = Variable(input_batch).cuda()
-            groundtruth_batch = groundtruth[start:end]
-            groundtruth_batch = torch.Tensor(groundtruth_batch).cuda()
-            target_var = Variable(groundtruth_batch, requires_grad=False).cuda()
-            pred = resnet(input_var)
+            if use_cache:
+                input_var = Variable(torch.from_numpy(np.array(feats[start:end])), volatile=True).cuda()
+                pred = head(input_var)
+            else:
+                image_batch_file = image_path[start:end]
+                input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
+                        image_batch_file))
+                input_batch = input_batch.astype(np.float32)
+                input_batch = np.transpose(input_batch, (0, 3, 1, 2))
+                input_batch = torch.Tensor(input_batch).cuda()
+                input_var = Variable(input_batch).cuda()
+                pred = resnet(input_var)
             pred = np.reshape(pred.data.cpu().numpy(), [-1, 80])
             all_preds[start:end, :] = pred
-        candidate = []
-        thres = 0.3
-        for instance in all_preds:
-            pred = []
-            for i, label in enumerate(instance):
-                if label > thres:
-                    pred.append(i)
-            if len(pred) == 0:
-                pred.append(np.argmax(instance))
-            candidate.append(pred)
-        num = 0
-        refsNum = 0
-        cansNum = 0
-        correctNum = 0
-        classwise_num = np.zeros((3,80))
-        for i in range(len(candidate)):
-            refs = reference[i]
-            refsNum += len(refs)
-            cans = candidate[i]
-            cansNum += len(cans)
-            refsDict = {}
-            correct = 0
-            can_str = []
-            ref_str = []
-            for c in cans:
-                refsDict[c] = 0  # follow idx of word_to_idx (keep 0, 1, 2)
-                classwise_num[0][c] += 1.0 # idx start from 0 for convenience
-            for r in refs:
-                refsDict[r] = 1
-                classwise_num[1][r] += 1.0
-            for c in cans:
-                if refsDict[c] == 1:
-                    correct += 1
-                    classwise_num[2][c] += 1.0
-            correctNum += correct
-        recall = float(correctNum)/float(refsNum)
-        precision = float(correctNum)/float(cansNum)
-        o_f1 = 2.0/((1.0/recall) + (1.0/precision))
-        for i in range(len(classwise_num[0])):
-            if classwise_num[0][i] == 0.0:
-                classwise_num[0][i] = 1.0
-        for i in range(len(classwise_num[1])):
-            if classwise_num[1][i] == 0.0:
-                classwise_num[1][i] = 1.0
-        recall_arr = classwise_num[2] / classwise_num[1]
-        precision_arr = classwise_num[2] / classwise_num[0]
-        c_recall = np.mean(recall_arr)
-        c_precision = np.mean(precision_arr)
-        c_f1 = 2.0/((1.0/c_recall) + (1.0/c_precision))
+        metrics = multilabel_metrics(all_preds, groundtruth, [0.3])
+        o_f1, c_f1 = metrics['o_f1'][0], metrics['c_f1'][0]
         print 'overall F1: ', o_f1
         print 'classwise F1: ', c_f1
 
@@ -18,6 +18,9 @@ import torch.utils.data
 import torchvision.transforms as transforms
 import torchvision.datasets as dset
 import torchvision.models as models
+from image_loader import load_image_path
+from cpu_distributed import *
+from weight_averaging import WeightEMA
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 
 resnet152 = models.resnet152(pretrained=True)
@@ -29,17 +32,36 @@ layers.append(nn.Linear(2048, 80))
 layers.append(nn.Sigmoid())
 resnet152.fc = nn.Sequential(*layers)
 # resnet152.fc = nn.Linear(2048, 80)
-resnet152 = nn.DataParallel(resnet152).cuda()
+
+# CPU data-parallel mode: launch one process per shard with RANK, WORLD_SIZE, MASTER_ADDR and
+# MASTER_PORT set; each process trains on its own parts, gradients are averaged over gloo and the
+# batch norm statistics once per epoch
+cpu_distributed = 'WORLD_SIZE' in os.environ
+if cpu_distributed:
+    rank, world_size = init_cpu_distributed()
+    broadcast_parameters(resnet152)
+    # same seed everywhere so all processes agree on the part order
+    np.random.seed(0)
+else:
+    rank, world_size = 0, 1
+    resnet152 = nn.DataParallel(resnet152).cuda()
 training_epoch = 50
 save_every = 1
 part_num = 20
 batch_size = 16
 
-criterion = nn.BCELoss().cuda()
+# set to also save an exponential moving average of the trained weights every epoch
+# (resnet_*_ema_<epoch>.pth.tar); it costs one extra weight update per step
+use_ema = False
+ema_decay = 0.999
+
+criterion = nn.BCELoss() if cpu_distributed else nn.BCELoss().cuda()
 optimizer = torch.optim.SGD(resnet152.parameters(),
                             0.1, # Learning rate
                             momentum=0.9,
                             weight_decay=1e-4)
+if use_ema:
+    ema = WeightEMA(resnet152, ema_decay)
 
 # Training part
 split = 'train'
@@ -48,12 +70,22 @@ curr_loss = []
 for i in range(part_num):
     prev_loss.append(-1)
     curr_loss.append(0)
+data_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata'
+part_sizes = [len(load_image_path(os.path.join(data_path, split, '%s.annotations_%s.pkl' % (split, str(part)))))
+              for part in range(part_num)]
+throughput = Throughput()
 start_time = time.time()
 for epoch in range(training_epoch):
     arr = np.arange(20)
     np.random.shuffle(arr)
-    for p in range(part_num):
-        part = arr[p]
+    # every process takes the same number of steps so the all-reduces pair up
+    n_steps = min(sum((part_sizes[part] + batch_size - 1) // batch_size for part in arr[r::world_size])
+                  for r in range(world_size))
+    step = 0
+    throughput.reset()
+    for part in arr[rank::world_size]:
+        if step == n_steps:
+            break
         print "part", part, "of epoch %d" % (epoch+1)
         anno_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata/%s/%s.annotations_%s.pkl'\
                     % (split, split, str(part))
@@ -62,45 +94,62 @@ for epoch in range(training_epoch):
         image_path = list(annotations['file_name'].unique())
         n_examples = len(image_path)
 
-        data_path = '/home/jason6582/sfyc/attention-tensorflow/mscoco/cocodata'
         data = load_coco_data(data_path=data_path, split='train', part=str(part))
         captions = data['captions']
-        groundtruth = np.zeros((n_examples, 80), dtype=np.float32)
-        for n, caption in enumerate(captions):
-            for index in caption:
-                if index > 2:
-                    groundtruth[n][index-3] = 1.0
+        groundtruth = label_matrix(data, 80)
 
         all_feats = np.ndarray([n_examples, 196, 1024], dtype=np.float32)
 
         for start, end in zip(range(0, n_examples, batch_size),
                             range(batch_size, n_examples + batch_size, batch_size)):
+            if step == n_steps:
+                break
+            step += 1
             image_batch_file = image_path[start:end]
             input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
                     image_batch_file))
             input_batch = input_batch.astype(np.float32)
             input_batch = np.transpose(input_batch, (0, 3, 1, 2))
-            input_batch = torch.Tensor(input_batch).cuda()
-            input_var = Variable(input_batch).cuda()
+            input_batch = torch.Tensor(input_batch)
             groundtruth_batch = groundtruth[start:end]
-            groundtruth_batch = torch.Tensor(groundtruth_batch).cuda()
-            target_var = Variable(groundtruth_batch).cuda()
+            groundtruth_batch = torch.Tensor(groundtruth_batch)
+            if cpu_distributed:
+                input_var = Variable(input_batch)
+                target_var = Variable(groundtruth_batch)
+            else:
+                input_var = Variable(input_batch).cuda()
+                target_var = Variable(groundtruth_batch).cuda()
 
             output = resnet152(input_var)
             loss = criterion(output, target_var)
             curr_loss[part] += loss.data.cpu().numpy()[0]
             optimizer.zero_grad()
             loss.backward()
+            if cpu_distributed:
+                all_reduce_gradients(resnet152, world_size)
             optimizer.step()
+            if use_ema:
+                ema.update()
+            throughput.update(len(image_batch_file))
         print "Previous epoch loss (part %s): " % str(part+1), prev_loss[part]
         print "Current epoch loss (part %s): " % str(part+1), curr_loss[part]
         print "Elapsed time: ", time.time() - start_time
         prev_loss[part] = curr_loss[part]
         curr_loss[part] = 0
-    if (epoch+1) % save_every == 0:
+    local_rate, total_rate = throughput.report(world_size)
+    print "Throughput: %.2f images/s (rank %d), %.2f images/s (%d processes)" \
+          % (local_rate, rank, total_rate, world_size)
+    if cpu_distributed:
+        all_reduce_buffers(resnet152, world_size)
+    if (epoch+1) % save_every == 0 and rank == 0:
         filename = 'model/resnet_epoch_%s.pth.tar' % str(epoch+1)
         print filename, 'saved.\n'
-        torch.save(resnet152.state_dict(), filename)
+        state_dict = module_state_dict(resnet152) if cpu_distributed else resnet152.state_dict()
+        torch.save(state_dict, filename)
+        if use_ema:
+            filename = 'model/resnet_epoch_ema_%s.pth.tar' % str(epoch+1)
+            print filename, 'saved.\n'
+            torch.save(ema.apply(state_dict, 'module.' if cpu_distributed else ''), filename)
 
 
 
@@ -20,9 +20,12 @@ def main():
     idx_to_word[0] = '<NULL>'
     idx_to_word[1] = '<START>'
     idx_to_word[2] = '<END>'
-    val_data = load_coco_data(data_path='./cocodata', split='val', load_init_pred=True)
+    # PCA-reduced features from prepro_pca.py: features = 'features_pca256', dim_feature = [196, 256]
+    features = 'features'
+    dim_feature = [196, 1024]
+    val_data = load_coco_data(data_path='./cocodata', split='val', load_init_pred=True, features=features)
     # test_data = load_coco_data(data_path='./cocodata', split='test', load_init_pred=True)
-    model = CaptionGenerator(word_to_idx, idx_to_word, dim_feature=[196, 1024], dim_embed=16,
+    model = CaptionGenerator(word_to_idx, idx_to_word, dim_feature=dim_feature, dim_embed=16,
                             dim_hidden=1024, n_time_step=16, prev2out=True,
                             ctx2out=True, alpha_c=1.0, selector=True, dropout=True)
     data_path = './cocodata'
@@ -11,7 +11,10 @@ def main():
     idx_to_word[0] = '<NULL>'
     idx_to_word[1] = '<START>'
     idx_to_word[2] = '<END>'
-    model = CaptionGenerator(word_to_idx, idx_to_word, dim_feature=[196, 1024], dim_embed=64,
+    # PCA-reduced features from prepro_pca.py: features = 'features_pca256', dim_feature = [196, 256]
+    features = 'features'
+    dim_feature = [196, 1024]
+    model = CaptionGenerator(word_to_idx, idx_to_word, dim_feature=dim_feature, dim_embed=64,
                             dim_hidden=1024, n_time_step=16, prev2out=True,
                             ctx2out=True, alpha_c=1.0, selector=True, dropout=True, batch_size=128)
     data_path = './cocodata'
@@ -19,7 +22,7 @@ def main():
                 update_rule='adam', learning_rate=0.0003, print_every=100, save_every=1,
                 pretrained_model=None, model_path='model/lstm/',
                 test_model='model/lstm/model-1', print_bleu=True, log_path='cocolog/',
-                V=len(word_to_idx), n_time_step=16)
+                V=len(word_to_idx), n_time_step=16, features=features)
     solver.train()
 
 if __name__ == "__main__":
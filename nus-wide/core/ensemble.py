@@ -0,0 +1,177 @@
+import numpy as np
+import cPickle as pickle
+import hickle
+import os
+import tempfile
+from metrics import *
+
+# Ensembles of per-checkpoint / per-model [N, C] score matrices (the solvers' *_pred.pkl,
+# init-pred .hkl files, ...). Every member is memory-mapped from a .npy copy written on first
+# use (see open_scores), so combining many members only reads one chunk of rows of each at a
+# time. Rank transforms and the combined matrix evaluate_ensemble scores live in anonymous
+# temporary memmaps (tempfile.gettempdir()), so memory does not grow with the number of members.
+
+METHODS = ['mean', 'rank', 'max']
+OBJECTIVES = ['map', 'o_f1', 'c_f1']
+
+
+def open_scores(path, cache_dir=None):
+    # read-only memmap of the [N, C] scores in path (.npy, .hkl or a pickled array). Other
+    # formats are converted once to a float32 <name>.npy copy, written next to path or into
+    # cache_dir, and rewritten when path is newer than the copy; delete the copies to reclaim
+    # the space
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if cache_dir is None:
+        cache = path + '.npy'
+    else:
+        cache = os.path.join(cache_dir, os.path.basename(path) + '.npy')
+    if not os.path.exists(cache) or os.path.getmtime(cache) < os.path.getmtime(path):
+        if path.endswith('.hkl'):
+            scores = hickle.load(path)
+        else:
+            with open(path, 'rb') as f:
+                scores = pickle.load(f)
+        np.save(cache, np.asarray(scores, dtype=np.float32))
+    return np.load(cache, mmap_mode='r')
+
+
+def rank_scores(scores):
+    # per-class rank of every image's score scaled to [0, 1]; equal scores share their mean rank
+    scores = np.asarray(scores)
+    ranks = np.empty(scores.shape, dtype=np.float32)
+    scale = max(len(scores) - 1, 1)
+    for c in range(scores.shape[1]):
+        column = np.sort(scores[:, c])
+        low = np.searchsorted(column, scores[:, c], side='left')
+        high = np.searchsorted(column, scores[:, c], side='right') - 1
+        ranks[:, c] = (low + high) / (2.0 * scale)
+    return ranks
+
+
+def _rank_memmap(scores):
+    # rank_scores of an [N, C] member computed one class at a time into a temporary memmap
+    ranks = np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode='w+', shape=scores.shape)
+    for c in range(scores.shape[1]):
+        ranks[:, c] = rank_scores(scores[:, c:c+1])[:, 0]
+    return ranks
+
+
+def _check_lengths(members):
+    lengths = set(len(member) for member in members)
+    if len(lengths) > 1:
+        raise ValueError('members score different numbers of images: %s'
+                         % ', '.join(str(n) for n in sorted(lengths)))
+
+
+def _column_map(column, n_classes, targets, mode):
+    # mean_average_precision of the [N, C] scores whose class c is column(c), one class at a
+    # time so the sorting temporaries only ever hold one column
+    return np.nanmean([average_precision(column(c)[:, np.newaxis], targets[:, c:c+1], mode)[0]
+                       for c in range(n_classes)])
+
+
+def _normalized(weights, n_members):
+    weights = np.ones(n_members) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(weights) != n_members or weights.min() < 0 or weights.sum() <= 0:
+        raise ValueError('need one non-negative weight per member, not all zero')
+    return weights / weights.sum()
+
+
+def iter_combined(members, weights=None, method='mean', chunk=1000):
+    # (start, rows) chunks of the combined scores of the [N, C] members:
+    #   'mean': weighted mean of the scores (uniform weights by default)
+    #   'rank': weighted mean of the per-class ranks (rank_scores), for members whose scores
+    #           are on different scales
+    #   'max': elementwise maximum of the members with a non-zero weight
+    if method not in METHODS:
+        raise ValueError('method must be one of %s' % ', '.join(METHODS))
+    _check_lengths(members)
+    weights = _normalized(weights, len(members))
+    members = [(member, w) for member, w in zip(members, weights) if w > 0]
+    if method == 'rank':
+        members = [(_rank_memmap(member), w) for member, w in members]
+    n_images = len(members[0][0])
+    for start in range(0, n_images, chunk):
+        end = min(start + chunk, n_images)
+        if method == 'max':
+            rows = np.max([member[start:end] for member, w in members], axis=0)
+        else:
+            rows = sum(w * np.asarray(member[start:end], dtype=np.float64) for member, w in members)
+        yield start, rows
+
+
+def combine_scores(members, weights=None, method='mean', chunk=1000):
+    # the whole combined [N, C] matrix of iter_combined, in memory
+    return np.vstack([rows for start, rows in iter_combined(members, weights, method, chunk)])
+
+
+def evaluate_ensemble(members, ref_counts, weights=None, method='mean', thres=0.5, mode='area', chunk=1000):
+    # count_metrics of the combined scores above thres (argmax if none is), accumulated chunk
+    # by chunk in a StreamingEvaluator, plus their mAP under metrics['map'] computed class by
+    # class from a temporary memmap of the combined scores; for 'rank' ensembles thres applies
+    # to the averaged ranks
+    _check_lengths(members)
+    evaluator = StreamingEvaluator(ref_counts)
+    combined = np.memmap(tempfile.TemporaryFile(), dtype=np.float64, mode='w+', shape=members[0].shape)
+    for start, rows in iter_combined(members, weights, method, chunk):
+        evaluator.update_counts(threshold_predictions(rows, thres)[0])
+        combined[start:start + len(rows)] = rows
+    metrics = evaluator.metrics()
+    targets = np.asarray(ref_counts)[:len(combined)] > 0
+    metrics['map'] = _column_map(lambda c: combined[:, c], combined.shape[1], targets, mode)
+    return metrics
+
+
+def _objective(total, source, n, ref_counts, objective, thres, mode, chunk):
+    # objective of the running ensemble (total + source) / n, class by class for 'map' and
+    # chunk by chunk for the F1s, without materializing the candidate matrix
+    if objective == 'map':
+        targets = np.asarray(ref_counts)[:len(total)] > 0
+        return _column_map(lambda c: (total[:, c] + source[:, c]) / n, total.shape[1], targets, mode)
+    evaluator = StreamingEvaluator(ref_counts)
+    for start in range(0, len(total), chunk):
+        rows = (total[start:start + chunk] + source[start:start + chunk]) / n
+        evaluator.update_counts(threshold_predictions(rows, thres)[0])
+    return evaluator.metrics()[objective]
+
+
+def fit_weights(members, ref_counts, method='mean', objective='map', thres=0.5, mode='area', rounds=20,
+                chunk=1000):
+    # weights for 'mean' / 'rank' ensembles chosen on a validation split by greedy forward
+    # selection with replacement: each round adds the member that most improves the objective
+    # ('map', 'o_f1' or 'c_f1' at thres) of the running ensemble, stopping after rounds or when
+    # no member helps; a member's weight is the share of the rounds that picked it. Members stay
+    # memory-mapped; only the running [N, C] sum is held in memory
+    if method not in ['mean', 'rank']:
+        raise ValueError("weights can only be fitted for 'mean' and 'rank' ensembles")
+    if objective not in OBJECTIVES:
+        raise ValueError('objective must be one of %s' % ', '.join(OBJECTIVES))
+    _check_lengths(members)
+    sources = [_rank_memmap(member) if method == 'rank' else member for member in members]
+    counts = np.zeros(len(members), dtype=np.int64)
+    total = np.zeros(members[0].shape, dtype=np.float64)
+    best = -np.inf
+    for r in range(rounds):
+        gains = [_objective(total, source, r + 1, ref_counts, objective, thres, mode, chunk) for source in sources]
+        pick = int(np.nanargmax(gains))
+        if gains[pick] <= best:
+            break
+        best = gains[pick]
+        counts[pick] += 1
+        total += sources[pick]
+    return counts / float(counts.sum())
+
+
+def write_ensemble(result_file, method, paths, weights, metrics):
+    # the members and their weights, then write_result's counts and lines and the mAP
+    weights = _normalized(weights, len(paths))
+    with open(result_file, 'w') as g:
+        g.write('method: %s\n' % method)
+        for path, weight in zip(paths, weights):
+            g.write('%s %s\n' % (str(round(float(weight), 4)), path))
+        g.write('\nTotal number of true label: ' + str(int(metrics['class_refs'].sum())) + '\n')
+        g.write('Total number of predict label: ' + str(int(metrics['class_cans'].sum())) + '\n')
+        g.write('Number of correct prediction: ' + str(int(metrics['class_correct'].sum())) + '\n\n')
+        g.write(format_metrics(metrics))
+        g.write('mAP: ' + str(float(metrics['map'])) + '\n')
@@ -0,0 +1,76 @@
+import sqlite3
+import time
+
+# SQLite store of evaluation results, one row per (model, epoch, threshold, split) run;
+# recording a run again replaces its row.
+# evaluate.py / evaluate_all.py append to <data>/results.db; query_results.py and result.py
+# read it back instead of re-parsing result_<model>-<epoch>_<thres>.txt files.
+
+METRIC_COLUMNS = ['o_r', 'o_p', 'o_f1', 'c_r', 'c_p', 'c_f1', 'average']
+COUNT_COLUMNS = ['n_refs', 'n_cans', 'n_correct']
+
+
+def open_results(db_path):
+    db = sqlite3.connect(db_path)
+    db.text_factory = str
+    db.execute('CREATE TABLE IF NOT EXISTS results ('
+               'model TEXT, epoch INTEGER, threshold REAL, split TEXT, %s, %s, '
+               'seconds REAL, source TEXT, created REAL)'
+               % (', '.join('%s REAL' % column for column in METRIC_COLUMNS),
+                  ', '.join('%s INTEGER' % column for column in COUNT_COLUMNS)))
+    if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'results_unique_run'").fetchone() is None:
+        # one row per run: keep the latest of any rows recorded before runs were replaced
+        with db:
+            db.execute('DELETE FROM results WHERE rowid NOT IN '
+                       '(SELECT MAX(rowid) FROM results GROUP BY model, split, epoch, threshold)')
+            db.execute('DROP INDEX IF EXISTS results_run')
+            db.execute('CREATE UNIQUE INDEX results_unique_run ON results (model, split, epoch, threshold)')
+    return db
+
+
+def record_runs(db_path, split, runs, sources=None):
+    # runs: (model, epoch, threshold, metrics) as returned by parse_run_name + count_metrics,
+    # sources: the candidate file of each run; metrics['seconds'] is stored as the evaluation
+    # time when present
+    if len(runs) == 0:
+        return
+    sources = sources if sources is not None else [''] * len(runs)
+    now = time.time()
+    rows = []
+    for (model, epoch, thres, metrics), source in zip(runs, sources):
+        counts = [int(metrics[key].sum()) for key in ['class_refs', 'class_cans', 'class_correct']]
+        rows.append([model, epoch, thres, split] + [float(metrics[key]) for key in METRIC_COLUMNS] +
+                    counts + [metrics.get('seconds'), source, now])
+    db = open_results(db_path)
+    with db:
+        # re-evaluating a run replaces its row; the DELETE also covers runs whose epoch and
+        # threshold are NULL, which the unique index treats as distinct
+        db.executemany('DELETE FROM results WHERE model IS ? AND epoch IS ? AND threshold IS ? AND split IS ?',
+                       [row[:4] for row in rows])
+        db.executemany('INSERT OR REPLACE INTO results VALUES (%s)' % ', '.join(['?'] * len(rows[0])), rows)
+    db.close()
+
+
+def query_runs(db_path, model=None, split=None, order_by=None, limit=None):
+    # (model, epoch, threshold, metrics) rows, optionally of one model / split, ordered by a
+    # metric column (best first) or by model, epoch and threshold
+    where, args = [], []
+    if model is not None:
+        where.append('model = ?')
+        args.append(model)
+    if split is not None:
+        where.append('split = ?')
+        args.append(split)
+    if order_by is not None and order_by not in METRIC_COLUMNS:
+        raise ValueError('order_by must be one of %s' % ', '.join(METRIC_COLUMNS))
+    sql = 'SELECT model, epoch, threshold, %s, seconds FROM results' % ', '.join(METRIC_COLUMNS + COUNT_COLUMNS)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY %s DESC' % order_by if order_by is not None else ' ORDER BY model, epoch, threshold'
+    if limit is not None:
+        sql += ' LIMIT %d' % int(limit)
+    db = open_results(db_path)
+    rows = db.execute(sql, args).fetchall()
+    db.close()
+    columns = METRIC_COLUMNS + COUNT_COLUMNS + ['seconds']
+    return [(row[0], row[1], row[2], dict(zip(columns, row[3:]))) for row in rows]
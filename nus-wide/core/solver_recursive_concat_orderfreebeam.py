@@ -9,6 +9,8 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_nus import *
+from metrics import *
+from results_db import *
 from tqdm import tqdm
 
 
@@ -129,10 +131,7 @@ class CaptioningSolver(object):
 
                     # groundtruth, logits_mask and end_time
                     groundtruth = np.zeros((n_examples, self.V), dtype=np.float32)
-                    for n, caption in enumerate(captions):
-                        for index in caption:
-                            if index > 2:
-                                groundtruth[n][index] = 1.0
+                    groundtruth[:, 3:] = label_matrix(self.data, self.V - 3)
 
                     label_num = np.sum(groundtruth, axis=1)
                     image_idxs = self.data['image_idxs']
@@ -201,63 +200,11 @@ class CaptioningSolver(object):
         return p
 
     def evaluate(self, candidate, thres, result_file):
-        reference = load_pickle('/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata/val/val.references81.pkl')
-        g = open(resultFile, 'w')
-        word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata',\
-                                    split='train')
-        idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
-        refsNum = 0
-        cansNum = 0
-        correctNum = 0
-        classwise_num = np.zeros((3,81))
-        for i in range(len(candidate)):
-            refs = str(reference[i][0][:-2]).split()
-            refsNum += len(refs)
-            cans = str(candidate[i][:]).split()
-            cansNum += len(cans)
-            refsDict = {}
-            correct = 0
-            for c in cans:
-                refsDict[c] = 0
-                idx = word_to_idx[c]
-                classwise_num[0][idx-3] += 1.0
-            for r in refs:
-                refsDict[r] = 1
-                idx = word_to_idx[r]
-                classwise_num[1][idx-3] += 1.0
-            for c in cans:
-                if refsDict[c] == 1:
-                    correct += 1
-                    idx = word_to_idx[c]
-                    classwise_num[2][idx-3] += 1.0
-            correctNum += correct
-        recall = float(correctNum)/float(refsNum)
-        precision = float(correctNum)/float(cansNum)
-        o_f1 = 2.0/((1.0/recall) + (1.0/precision))
-        for i in range(len(classwise_num[0])):
-            if classwise_num[0][i] == 0.0:
-                classwise_num[0][i] = 1.0
-        for i in range(len(classwise_num[1])):
-            if classwise_num[1][i] == 0.0:
-                classwise_num[1][i] = 1.0
-
-        recall_arr = classwise_num[2] / classwise_num[1]
-        precision_arr = classwise_num[2] / classwise_num[0]
-        c_recall = np.mean(recall_arr)
-        c_precision = np.mean(precision_arr)
-        c_f1 = 2.0/((1.0/c_recall) + (1.0/c_precision))
-
-        g.write('Total number of true label: ' + str(refsNum) + '\n')
-        g.write('Total number of predict label: ' + str(cansNum) + '\n')
-        g.write('Number of correct prediction: ' + str(correctNum) + '\n\n')
-        g.write('O-R: ' + str(recall) + '\n')
-        g.write('O-P: ' + str(precision) + '\n')
-        g.write('O-F1: ' + str(o_f1) + '\n')
-        g.write('C-R: ' + str(c_recall) + '\n')
-        g.write('C-P: ' + str(c_precision) + '\n')
-        g.write('C-F1: ' + str(c_f1) + '\n')
-        g.write('Average: ' + str((c_f1+o_f1)/2) + '\n')
-
+        word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+        reference = reference_labels(load_nus_references(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='val'), word_to_idx)
+        candidate = tag_labels(candidate, word_to_idx)
+        metrics = count_metrics(label_counts(candidate, 81), label_counts(reference[:len(candidate)], 81))
+        write_result(result_file, metrics)
 
     def test(self, split='train', attention_visualization=True, save_sampled_captions=True,\
              filename='', thres=0.0):
@@ -284,6 +231,9 @@ class CaptioningSolver(object):
             MAX_LEN = 5
             K = 3 # beam search width
             all_sam_cap = []
+            all_sam_scores = []
+            evaluator = StreamingEvaluator(label_counts(reference_labels(load_nus_references(data_path='./nusdata', split=split),
+                                                                         self.model.word_to_idx), 81))
             all_alphas = []
             if split == 'val':
                 part_num = 1
@@ -303,6 +253,7 @@ class CaptioningSolver(object):
                     for i in tqdm(range(num_iter)):
                         features_batch = features[i:i+1]
                         init_pred_batch = init_pred[i:i+1]
+                        beam_scores = {}
                         pathProbs = []
                         for k in range(K):
                             pathProbs.append(1.0)
@@ -367,6 +318,8 @@ class CaptioningSolver(object):
                             for each_path in paths_info:
                                 print each_path[0]
                             pathProbs = newPathProbs
+                            for beam, beam_prob in zip(paths_info, pathProbs):
+                                beam_scores[tuple(beam[0])] = beam_prob
                         '''
                         order_free_pathProbs = []
                         for path_i in range(len(paths_info)):
@@ -393,18 +346,34 @@ class CaptioningSolver(object):
                         alphas = paths_info[max_index][3]
                         '''
                         all_sam_cap.append(paths_info[0][0])
+                        # beam score of every prefix of the path, i.e. of each label in decoding order
+                        all_sam_scores.append([beam_scores[tuple(all_sam_cap[-1][:m+1])] for m in range(len(all_sam_cap[-1]))])
+                        evaluator.update(all_sam_cap[-1:])
+                        if i % 50 == 0:
+                            tqdm.write(evaluator.status())
                         alphas = paths_info[0][4]
                         alpha_list = np.transpose(alphas, (1, 0, 2))     # (N, T, L)
                         all_alphas.append(alpha_list)
             all_decoded = decode_py_captions(all_sam_cap, self.model.idx_to_word)
-            save_pickle(all_decoded, "./nusdata/%s/%s.candidate.captions81_%s_%s.pkl" % \
-                        (split, split, filename, THRES))
+            candidate_file = "./nusdata/%s/%s.candidate.captions81_%s_%s.pkl" % (split, split, filename, THRES)
+            if save_sampled_captions:
+                save_pickle(all_decoded, candidate_file)
+                save_pickle(zip(all_sam_cap, all_sam_scores), "./nusdata/%s/%s.ranked.captions81_%s_%s.pkl" % \
+                            (split, split, filename, THRES))
+            metrics = evaluator.metrics()
+            metrics['seconds'] = time.time() - evaluator.start_t
+            write_result("./nusdata/%s/result_%s_%s.txt" % (split, filename, THRES), metrics)
+            record_runs('./nusdata/results.db', split, [parse_run_name(candidate_file) + (metrics,)], [candidate_file])
+            print format_metrics(metrics)
+            ranking = ranking_metrics(pad_rankings(all_sam_cap), evaluator.ref_counts)
+            write_ranking("./nusdata/%s/ranking_%s_%s.txt" % (split, filename, THRES), ranking)
+            print 'R@3: %.4f' % ranking['r@3']
             print "Time cost: ", time.time()- start_t
 
             image_file_name = 'visualization/'
             if attention_visualization:
                 num_samples = len(all_decoded)
-                reference = load_pickle('./nusdata/val/val.references81.pkl')
+                reference = load_nus_references(data_path='./nusdata', split='val')
                 sample_file = open('sample.txt', 'w')
                 sample_file.write('Grountruth:          Sample:\n')
                 groundtruth = []
@@ -19,12 +19,17 @@ def load_data(data_path='./data', split='train'):
     start_t = time.time()
     data = {}
     data['features'] = hickle.load(os.path.join(data_path, '%s.features81.hkl' % (split)))
-    with open(os.path.join(data_path, '%s.file.names81.pkl' % (split)), 'rb') as f:
-        data['file_names'] = pickle.load(f)
-    with open(os.path.join(data_path, '%s.captions81.pkl' % (split)), 'rb') as f:
-        data['captions'] = pickle.load(f)
-    with open(os.path.join(data_path, '%s.image.idxs81.pkl' % (split)), 'rb') as f:
-        data['image_idxs'] = pickle.load(f)
+    # splits built by prepro_tags81.py come as one npz, those of prepro81.py as pickles
+    dataset_path = os.path.join(data_path, '%s.dataset81.npz' % (split))
+    if os.path.exists(dataset_path):
+        data.update(_load_dataset(dataset_path))
+    else:
+        with open(os.path.join(data_path, '%s.file.names81.pkl' % (split)), 'rb') as f:
+            data['file_names'] = pickle.load(f)
+        with open(os.path.join(data_path, '%s.captions81.pkl' % (split)), 'rb') as f:
+            data['captions'] = pickle.load(f)
+        with open(os.path.join(data_path, '%s.image.idxs81.pkl' % (split)), 'rb') as f:
+            data['image_idxs'] = pickle.load(f)
     '''
     n_examples = len(data['image_idxs'])
     rand_idxs = np.random.permutation(n_examples)
@@ -49,21 +54,36 @@ def load_data(data_path='./data', split='train'):
     print "Elapse time: %.2f" %(end_t - start_t)
     return data
 
-def load_nus_data(data_path='./data', split='train', part='', load_init_pred=False):
+def _load_dataset(path):
+    # columnar split written by prepro_tags81.py: one npz instead of one pickle per array
+    dataset = np.load(path)
+    return {'file_names': dataset['file_names'],
+            'captions': dataset['captions'],
+            'image_idxs': dataset['image_idxs'],
+            'label_offsets': dataset['label_offsets'],
+            'label_values': dataset['label_values'],
+            'labels': dataset['labels']}
+
+def load_nus_data(data_path='./data', split='train', part='', load_init_pred=False, features='features81'):
+    # features names the feature files, e.g. 'features81_pca256' for the ones written by prepro_pca.py
     data_path = os.path.join(data_path, split)
     start_t = time.time()
     data = {}
     if split in ['train', 'test']:
-        data['features'] = hickle.load(os.path.join(data_path, '%s.features81_%s.hkl' % (split, part)))
+        data['features'] = hickle.load(os.path.join(data_path, '%s.%s_%s.hkl' % (split, features, part)))
         print 'load_init_pred', load_init_pred
         if load_init_pred == True:
             data['init_pred'] = hickle.load(os.path.join(data_path, '%s.init.pred81_%s.hkl' % (split, part)))
-        with open(os.path.join(data_path, '%s.file.names81_%s.pkl' % (split, part)), 'rb') as f:
-            data['file_names'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.captions81_%s.pkl' % (split, part)), 'rb') as f:
-            data['captions'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.image.idxs81_%s.pkl' % (split, part)), 'rb') as f:
-            data['image_idxs'] = pickle.load(f)
+        dataset_path = os.path.join(data_path, '%s.dataset81_%s.npz' % (split, part))
+        if os.path.exists(dataset_path):
+            data.update(_load_dataset(dataset_path))
+        else:
+            with open(os.path.join(data_path, '%s.file.names81_%s.pkl' % (split, part)), 'rb') as f:
+                data['file_names'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.captions81_%s.pkl' % (split, part)), 'rb') as f:
+                data['captions'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.image.idxs81_%s.pkl' % (split, part)), 'rb') as f:
+                data['image_idxs'] = pickle.load(f)
         with open(os.path.join(data_path, 'word_to_idx81.pkl'), 'rb') as f:
             data['word_to_idx'] = pickle.load(f)
         '''
@@ -74,15 +94,19 @@ def load_nus_data(data_path='./data', split='train', part='', load_init_pred=Fal
                 print k, type(v), len(v)
         '''
     else:
-        data['features'] = hickle.load(os.path.join(data_path, '%s.features81.hkl' % split))
+        data['features'] = hickle.load(os.path.join(data_path, '%s.%s.hkl' % (split, features)))
         if load_init_pred == True:
             data['init_pred'] = hickle.load(os.path.join(data_path, '%s.init.pred81.hkl' % split))
-        with open(os.path.join(data_path, '%s.file.names81.pkl' %split), 'rb') as f:
-            data['file_names'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.captions81.pkl' %split), 'rb') as f:
-            data['captions'] = pickle.load(f)
-        with open(os.path.join(data_path, '%s.image.idxs81.pkl' %split), 'rb') as f:
-            data['image_idxs'] = pickle.load(f)
+        dataset_path = os.path.join(data_path, '%s.dataset81.npz' % split)
+        if os.path.exists(dataset_path):
+            data.update(_load_dataset(dataset_path))
+        else:
+            with open(os.path.join(data_path, '%s.file.names81.pkl' %split), 'rb') as f:
+                data['file_names'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.captions81.pkl' %split), 'rb') as f:
+                data['captions'] = pickle.load(f)
+            with open(os.path.join(data_path, '%s.image.idxs81.pkl' %split), 'rb') as f:
+                data['image_idxs'] = pickle.load(f)
         for k, v in data.iteritems():
             if type(v) == np.ndarray:
                 print k, type(v), v.shape, v.dtype
@@ -92,6 +116,37 @@ def load_nus_data(data_path='./data', split='train', part='', load_init_pred=Fal
     print "Elapse time: %.2f" %(end_t - start_t)
     return data
 
+def load_nus_references(data_path='./data', split='val', part=''):
+    # returns {image_idx: ['tag tag ... .']} like the old %s.references81.pkl files
+    suffix = '_%s' % part if part != '' else ''
+    dataset_path = os.path.join(data_path, split, '%s.dataset81%s.npz' % (split, suffix))
+    if not os.path.exists(dataset_path):
+        return load_pickle(os.path.join(data_path, split, '%s.references81%s.pkl' % (split, suffix)))
+    dataset = np.load(dataset_path)
+    word_to_idx = load_word_to_idx(data_path=data_path, split='train')
+    idx_to_word = dict((i, w) for w, i in word_to_idx.iteritems())
+    words = [idx_to_word[label + 3] for label in dataset['label_values']]
+    offsets = dataset['label_offsets']
+    return dict((i, [' '.join(words[offsets[i]:offsets[i+1]]) + ' .']) for i in range(len(offsets) - 1))
+
+def tag_labels(tag_strings, word_to_idx):
+    # 0-based class ids of space-separated tag strings (label = word index - 3)
+    return [[word_to_idx[tag] - 3 for tag in str(tags).split()] for tags in tag_strings]
+
+def reference_labels(references, word_to_idx):
+    # 0-based class ids of each image, in image order, from load_nus_references ('tag tag .')
+    return tag_labels([references[i][0][:-2] for i in range(len(references))], word_to_idx)
+
+def label_matrix(data, n_classes=81):
+    # multi-hot ground truth of shape (n_captions, n_classes); label = word index - 3
+    if 'labels' in data:
+        return np.unpackbits(data['labels'], axis=1)[:, :n_classes].astype(np.float32)
+    # old pickled splits only carry the padded captions
+    captions = data['captions']
+    multi_hot = np.zeros((len(captions), n_classes + 3), dtype=np.float32)
+    multi_hot[np.arange(len(captions))[:, None], captions] = 1.0
+    return multi_hot[:, 3:]
+
 def decode_captions(captions, idx_to_word):
     # for i in idx_to_word.iteritems():
     #     print i
@@ -0,0 +1,28 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
+
+# Per-class error analysis of a candidate file: F1 by class frequency bucket (frequencies of
+# the evaluated split's references), true versus predicted label set sizes, the most frequent
+# missed -> predicted confusions and a one-line summary per class:
+#   python analyze.py <candidate file> <result file> [split]
+
+candidateFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_buckets = 4
+
+from core.utils_nus import *
+from core.metrics import *
+word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
+reference = reference_labels(load_nus_references(data_path='..', split=split), word_to_idx)
+candidate = tag_labels(load_pickle(candidateFile), word_to_idx)
+class_names = [idx_to_word[c+3] for c in range(81)]
+
+cand_counts = label_counts(candidate, 81)
+ref_counts = label_counts(reference[:len(candidate)], 81)
+metrics = count_metrics(cand_counts, ref_counts)
+write_error_analysis(resultFile, metrics, error_matrices(cand_counts, ref_counts),
+                     set_size_calibration(cand_counts, ref_counts),
+                     frequency_buckets(metrics, metrics['class_refs'], n_buckets), class_names)
@@ -0,0 +1,50 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
+
+# Bootstrap intervals of O-F1, C-F1 and mAP for one or more systems on the same resampled test
+# images, and paired tests of every system against the first:
+#   python bootstrap.py <result file> <system> [<system> ...]
+# a system is a candidate pickle, or "candidates.pkl,scores.hkl" to include mAP of the raw
+# [N, C] scores, e.g. test.candidate.captions81_nus_recursive-9_0.3.pkl test.candidate.captions81_nus_noatt-8_0.3.pkl
+
+resultFile = sys.argv[1]
+systems = sys.argv[2:]
+n_boot = 1000
+alpha = 0.05
+
+from core.utils_nus import *
+from core.metrics import *
+import hickle
+word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+reference = reference_labels(load_nus_references(data_path='..', split='test'), word_to_idx)
+ref_counts = label_counts(reference, 81)
+
+def load_scores(path):
+    return hickle.load(path) if path.endswith('.hkl') else np.asarray(load_pickle(path))
+
+names, inputs = [], []
+for system in systems:
+    paths = system.split(',')
+    cand_counts = label_counts(tag_labels(load_pickle(paths[0]), word_to_idx), 81)
+    scores = load_scores(paths[1]) if len(paths) > 1 else None
+    names.append(paths[0])
+    inputs.append((cand_counts, scores))
+
+# systems are resampled image by image, so they must cover the same images; like evaluate.py
+# a candidate file may stop before the end of the split
+n_images = len(inputs[0][0])
+for name, (cand_counts, scores) in zip(names, inputs):
+    if len(cand_counts) != n_images or (scores is not None and len(scores) != n_images):
+        raise ValueError('%s: %d candidates and %s scores, expected %d images'
+                         % (name, len(cand_counts), len(scores) if scores is not None else 'no', n_images))
+ref_counts = ref_counts[:n_images]
+targets = ref_counts > 0
+
+points = []
+for cand_counts, scores in inputs:
+    point = count_metrics(cand_counts, ref_counts)
+    point['map'] = mean_average_precision(scores, targets) if scores is not None else np.nan
+    points.append(point)
+
+write_bootstrap(resultFile, names, points, bootstrap_metrics(inputs, ref_counts, n_boot), alpha)
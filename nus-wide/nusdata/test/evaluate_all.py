@@ -0,0 +1,36 @@
+import sys
+import glob
+import time
+import numpy as np
+from multiprocessing import Pool
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
+
+# Evaluates every candidate pickle matching a glob in a process pool, with the references
+# and vocabulary loaded once, records every run in ../results.db and writes one table in
+# result.py's layout:
+#   python evaluate_all.py 'test.candidate.captions81_nus_recursive_concat-*.pkl' <table file> [split] [processes]
+
+candidatePattern = sys.argv[1]
+tableFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+from core.utils_nus import *
+from core.metrics import *
+from core.results_db import *
+word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+ref_counts = label_counts(reference_labels(load_nus_references(data_path='..', split=split), word_to_idx), 81)
+
+def evaluate_file(path):
+    start_t = time.time()
+    candidate = tag_labels(load_pickle(path), word_to_idx)
+    metrics = count_metrics(label_counts(candidate, 81), ref_counts[:len(candidate)])
+    metrics['seconds'] = time.time() - start_t
+    return parse_run_name(path) + (metrics,)
+
+pool = Pool(n_processes)
+paths = sorted(glob.glob(candidatePattern))
+runs = pool.map(evaluate_file, paths)
+pool.close()
+record_runs('../results.db', split, runs, paths)
+write_run_table(tableFile, runs)
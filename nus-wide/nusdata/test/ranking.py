@@ -0,0 +1,29 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
+
+# P@k, R@k, NDCG@k and LRAP of ranked outputs: the ordered label paths the decoders save
+# next to their candidate pickle (test.ranked.captions81_<model>-<epoch>_<thres>.pkl)
+# or raw [N, 81] scores ranked per image (e.g. test.init.pred81.hkl):
+#   python ranking.py <ranked.pkl|scores.hkl|scores.pkl> <result file> [split]
+
+rankFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+
+from core.utils_nus import *
+from core.metrics import *
+import hickle
+outputs = hickle.load(rankFile) if rankFile.endswith('.hkl') else load_pickle(rankFile)
+if isinstance(outputs[0], tuple):
+    # (labels, scores) per image, labels in decoding order
+    ranked = pad_rankings([labels for labels, scores in outputs])
+else:
+    ranked = rank_labels(np.asarray(outputs))
+
+word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+reference = reference_labels(load_nus_references(data_path='..', split=split), word_to_idx)
+ks = (1, 3, 5)
+metrics = ranking_metrics(ranked, label_counts(reference, 81), ks)
+write_ranking(resultFile, metrics, ks)
+print 'R@3: %.4f' % metrics['r@3']
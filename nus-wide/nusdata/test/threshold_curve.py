@@ -0,0 +1,29 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
+
+# O-F1/C-F1 versus threshold of raw [N, 81] scores (e.g. test.init.pred81.hkl), with the best
+# global and per-class thresholds, from one pass over the scores instead of one evaluate.py
+# run per threshold:
+#   python threshold_curve.py <scores.hkl|.pkl> <result file> [split] [n_thresholds]
+# pick the thresholds on the val split and apply them to test.
+
+scoreFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_thresholds = int(sys.argv[4]) if len(sys.argv) > 4 else 1000
+
+from core.utils_nus import *
+from core.metrics import *
+import hickle
+scores = hickle.load(scoreFile) if scoreFile.endswith('.hkl') else np.asarray(load_pickle(scoreFile))
+word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata', split='train')
+idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
+reference = reference_labels(load_nus_references(data_path='..', split=split), word_to_idx)
+targets = label_counts(reference, 81)[:len(scores)] > 0
+
+# the distinct scores (or n_thresholds quantiles of them) rather than a fixed grid
+thresholds = score_thresholds(scores, n_thresholds)
+curve = threshold_curve(scores, targets, thresholds)
+class_metrics = multilabel_metrics(scores, targets, best_thresholds(curve, thresholds)['class'][np.newaxis])
+write_threshold_curve(resultFile, thresholds, curve, [idx_to_word[c+3] for c in range(81)], class_metrics)
@@ -13,6 +13,11 @@ import math
 import random
 os.environ['CUDA_VISIBLE_DEVICES']='1'
 
+# punctuation stripped from (or rewritten in) every caption, applied in a single translate pass
+_caption_table = dict((ord(c), None) for c in u'.,\'"()')
+_caption_table[ord(u'&')] = u'and'
+_caption_table[ord(u'-')] = u' '
+
 def _process_caption_data(caption_file, image_dir, max_length):
     with open(caption_file) as f:
         caption_data = json.load(f)
@@ -30,19 +35,15 @@ def _process_caption_data(caption_file, image_dir, max_length):
     del caption_data['id']
     # caption_data.sort_values(by='image_id', inplace=True)
     # caption_data = caption_data.reset_index(drop=True)   
-    del_idx = []
-    for i, caption in enumerate(caption_data['caption']):
-        caption = caption.replace('.','').replace(',','').replace("'","").replace('"','')
-        caption = caption.replace('&','and').replace('(','').replace(")","").replace('-',' ')
-        caption = " ".join(caption.split())  # replace multiple spaces
-        
-        caption_data.set_value(i, 'caption', caption.lower())
-        if len(caption.split(" ")) > max_length:
-            del_idx.append(i)
-    
+    captions = caption_data['caption'].str.translate(_caption_table)
+    captions = captions.str.split().str.join(u' ').str.lower()  # replace multiple spaces
+    # captions are single-space separated now, so word count is space count + 1
+    keep = captions.str.count(u' ') < max_length
+    caption_data['caption'] = captions
+
     # delete captions if size is larger than max_length
     print "The number of captions before deletion: %d" %len(caption_data)
-    caption_data = caption_data.drop(caption_data.index[del_idx])
+    caption_data = caption_data[keep]
     caption_data = caption_data.reset_index(drop=True)
     print "The number of captions after deletion: %d" %len(caption_data)
     return caption_data
@@ -127,7 +128,8 @@ def main():
     # if word occurs less than word_count_threshold in training dataset, the word index is special unknown token.
     word_count_threshold = 1
     # vgg model path 
-    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.mat'
+    # conv weights converted once from imagenet-vgg-verydeep-19.mat with python -m core.vggnet
+    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.npz'
 
     # about 80000 images and 400000 captions for train dataset
     dataset = _process_caption_data(caption_file='/home/jason6582/sfyc/NUS-WIDE/dataset.json',
@@ -212,6 +214,7 @@ def main():
     vggnet.build()
     with tf.Session() as sess:
         tf.initialize_all_variables().run()
+        vggnet.load_params(sess)
         split = 'train'
         for part in range(50):
             print "part", part, "of %s features" % split
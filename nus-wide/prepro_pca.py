@@ -0,0 +1,71 @@
+from core.utils_nus import *
+
+import numpy as np
+import hickle
+import os
+
+# Reduces the [196, 1024] NUS-WIDE attention features to [196, dim] with PCA fitted on the train
+# features. The basis is saved next to word_to_idx.pkl so extraction (FeatureTap(basis=...))
+# and later splits use the same projection; train with features='features81_pca<dim>' and
+# dim_feature=[196, dim].
+
+
+def _fit_pca(feature_paths, dim, max_images=4000):
+    # principal axes of the per-location feature vectors of up to max_images train images,
+    # from the D x D scatter matrix accumulated in float64
+    total, scatter, n_rows, n_images = 0.0, 0.0, 0, 0
+    for path in feature_paths:
+        features = hickle.load(path)[:max_images - n_images]
+        rows = features.reshape(-1, features.shape[-1]).astype(np.float64)
+        total = total + rows.sum(axis=0)
+        scatter = scatter + np.dot(rows.T, rows)
+        n_rows += rows.shape[0]
+        n_images += features.shape[0]
+        if n_images >= max_images:
+            break
+    mean = total / n_rows
+    eigvals, eigvecs = np.linalg.eigh(scatter / n_rows - np.outer(mean, mean))
+    order = np.argsort(eigvals)[::-1][:dim]
+    print "Variance kept by %d components: %.4f" % (dim, eigvals[order].sum() / eigvals.sum())
+    return {'mean': mean.astype(np.float32), 'components': eigvecs[:, order].T.astype(np.float32),
+            'explained_variance': eigvals[order].astype(np.float32)}
+
+
+def _project(features, basis, chunk_size=500):
+    reduced = np.empty(features.shape[:-1] + (basis['components'].shape[0],), dtype=np.float32)
+    for start in range(0, features.shape[0], chunk_size):
+        chunk = features[start:start+chunk_size]
+        reduced[start:start+chunk_size] = np.dot(chunk - basis['mean'], basis['components'].T)
+    return reduced
+
+
+def _feature_path(data_path, split, feature_name, part=''):
+    # same file names load_nus_data reads: train and test come in parts, val doesn't
+    if split in ['train', 'test']:
+        return os.path.join(data_path, split, '%s.%s_%s.hkl' % (split, feature_name, part))
+    return os.path.join(data_path, split, '%s.%s.hkl' % (split, feature_name))
+
+
+def _save_projection(load_path, save_path, basis):
+    hickle.dump(_project(hickle.load(load_path), basis), save_path)
+    print ('Saved %s..' % save_path)
+
+
+def main():
+    dim = 256
+    data_path = './nusdata'
+    feature_name = 'features81_pca%d' % dim
+    split_parts = {'train': [str(part) for part in range(16)],
+                   'val': [''],
+                   'test': [str(part) for part in range(10)]}
+
+    basis = _fit_pca([_feature_path(data_path, 'train', 'features81', part) for part in split_parts['train']], dim)
+    np.savez(os.path.join(data_path, 'train', '%s.npz' % feature_name), **basis)
+
+    for split in ['train', 'val', 'test']:
+        for part in split_parts[split]:
+            _save_projection(_feature_path(data_path, split, 'features81', part),
+                             _feature_path(data_path, split, feature_name, part), basis)
+
+if __name__ == "__main__":
+    main()
@@ -128,7 +128,8 @@ def main():
     word_count_threshold = 1
     part_num = 10
     # vgg model path 
-    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.mat'
+    # conv weights converted once from imagenet-vgg-verydeep-19.mat with python -m core.vggnet
+    vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.npz'
 
     # about 80000 images and 400000 captions for train dataset
     dataset = _process_caption_data(caption_file='/home/jason6582/sfyc/NUS-WIDE/dataset.json',
@@ -215,6 +216,7 @@ def main():
     vggnet.build()
     with tf.Session() as sess:
         tf.initialize_all_variables().run()
+        vggnet.load_params(sess)
         split = 'train'
         for part in range(50):
             print "part", part, "of %s features" % split
@@ -0,0 +1,131 @@
+from core.utils_nus import *
+
+import numpy as np
+import os
+
+# Builds the loader-ready NUS-WIDE Lite splits directly from the 0/1 concept
+# matrices, without going through caption strings (makeJSON.py), JSON and pandas (prepro81.py).
+# Like prepro81.py it writes the Lite layout (16 train parts, val from the head of the train
+# list) under ./data/, apart from the full NUS-WIDE layout prepro_nus.py writes under ./nusdata/.
+# pytorch_extract/extract_all.py lite extracts their features from the image lists in the npz
+# files (load_image_path); load_nus_data(data_path='./data') then reads the train parts and
+# load_data the unparted val and test splits.
+
+tagListFile = '/home/jason6582/sfyc/NUS-WIDE/tags/TagList1k.txt'
+
+imageListFile1 = '/home/jason6582/sfyc/NUS_Lite/Train_imageOutPutFileList.txt'
+tagsFile1 = '/home/jason6582/sfyc/NUS_Lite/Lite_Tags81_Train.txt'
+
+imageListFile2 = '/home/jason6582/sfyc/NUS_Lite/Test_imageOutPutFileList.txt'
+tagsFile2 = '/home/jason6582/sfyc/NUS_Lite/Lite_Tags81_Test.txt'
+
+image_dir = '/home/jason6582/sfyc/NUS-WIDE/flickrfeature_resized/'
+
+# caption clean-up of prepro81.py, applied to the tag names makeJSON.py writes as captions
+_caption_table = dict((ord(c), None) for c in u'.,\'"()')
+_caption_table[ord(u'&')] = u'and'
+_caption_table[ord(u'-')] = u' '
+
+
+def _load_tag_matrix(tags_file, image_list_file, max_length):
+    tags = np.loadtxt(tags_file, dtype=np.uint8, ndmin=2)
+    with open(image_list_file) as f:
+        file_names = np.array([os.path.join(image_dir, line.rstrip('\r\n')) for line in f], dtype=np.unicode_)
+    # images without any concept have no caption in makeJSON.py, long ones are dropped by prepro81.py
+    label_num = tags.sum(axis=1)
+    keep = (label_num > 0) & (label_num <= max_length)
+    print "The number of images before deletion: %d" %len(tags)
+    print "The number of images after deletion: %d" %keep.sum()
+    return tags[keep], file_names[keep]
+
+
+def _select_vocab(train_tags, tag_names):
+    # like prepro81.py, the vocabulary is the words of the tags seen in the train parts;
+    # returns their columns and words. each tag has to stay a single distinct word
+    columns = np.flatnonzero(train_tags.sum(axis=0) > 0)
+    words = [tag_names[j].translate(_caption_table).lower().split() for j in columns]
+    if any(len(w) != 1 for w in words) or len(set(w[0] for w in words)) != len(words):
+        raise ValueError('tag names do not map to distinct single caption words')
+    print ('%d of %d tags seen in train.' % (len(columns), len(tag_names)))
+    return columns, [w[0] for w in words]
+
+
+def _build_word_to_idx(tag_names):
+    # same ordering as prepro81.py: special tokens and tags sorted together
+    word_list = sorted([u'<NULL>', u'<START>', u'<END>'] + tag_names)
+    return dict((word, i) for i, word in enumerate(word_list))
+
+
+def _build_dataset(tags, file_names, word_to_idx, tag_names, max_length=20):
+    n_examples, n_classes = tags.shape
+    # column j of the tag matrix is label word_to_idx[tag_names[j]] - 3
+    column_labels = np.array([word_to_idx[name] - 3 for name in tag_names])
+
+    # CSR label sets; labels keep the column order makeJSON.py wrote them in
+    rows, cols = np.nonzero(tags)
+    label_values = column_labels[cols]
+    label_offsets = np.zeros(n_examples + 1, dtype=np.int32)
+    label_offsets[1:] = np.cumsum(np.bincount(rows, minlength=n_examples))
+    lengths = np.diff(label_offsets)
+
+    # <START>, the labels, <END>, then <NULL> padding up to a fixed-size vector
+    captions = np.full((n_examples, max_length+2), word_to_idx['<NULL>'], dtype=np.int32)
+    captions[:, 0] = word_to_idx['<START>']
+    captions[rows, np.arange(len(rows)) - label_offsets[rows] + 1] = label_values + 3
+    captions[np.arange(n_examples), lengths + 1] = word_to_idx['<END>']
+
+    multi_hot = np.zeros((n_examples, n_classes), dtype=np.uint8)
+    multi_hot[:, column_labels] = tags
+    label_dtype = np.int8 if n_classes <= np.iinfo(np.int8).max else np.int16
+    return {'captions': captions,
+            'file_names': file_names,
+            'image_idxs': np.arange(n_examples, dtype=np.int32),
+            'label_offsets': label_offsets,
+            'label_values': label_values.astype(label_dtype),
+            'labels': np.packbits(multi_hot, axis=1),
+            'n_classes': n_classes}
+
+
+def _save_dataset(tags, file_names, word_to_idx, tag_names, max_length, path):
+    np.savez(path, **_build_dataset(tags, file_names, word_to_idx, tag_names, max_length))
+    print ('Saved %s..' %path)
+
+
+def main():
+    # maximum number of labels per image. if an image has more than max_length labels, deleted.
+    max_length = 20
+    part_num = 16
+
+    train_tags, train_file_names = _load_tag_matrix(tagsFile1, imageListFile1, max_length)
+    test_tags, test_file_names = _load_tag_matrix(tagsFile2, imageListFile2, max_length)
+    with open(tagListFile) as f:
+        tag_names = [line.strip().decode('utf-8') for line in f][:train_tags.shape[1]]
+
+    # about 4000 images for val, taken from the head of the train list as in prepro81.py
+    val_cutoff = int(len(train_tags)/10)
+    # tags never seen in the train parts are dropped from every split, as prepro81.py's caption
+    # vectors skip words outside the vocabulary
+    columns, tag_names = _select_vocab(train_tags[val_cutoff:], tag_names)
+    for name, tags in [('val', train_tags[:val_cutoff]), ('test', test_tags)]:
+        print ('Dropped %d %s labels outside the vocabulary.' % (tags.sum() - tags[:, columns].sum(), name))
+    train_tags = train_tags[:, columns]
+    test_tags = test_tags[:, columns]
+    word_to_idx = _build_word_to_idx(tag_names)
+    save_pickle(word_to_idx, './data/train/word_to_idx81.pkl')
+
+    _save_dataset(train_tags[:val_cutoff], train_file_names[:val_cutoff], word_to_idx, tag_names,
+                  max_length, './data/val/val.dataset81.npz')
+    _save_dataset(test_tags, test_file_names, word_to_idx, tag_names,
+                  max_length, './data/test/test.dataset81.npz')
+
+    train_tags = train_tags[val_cutoff:]
+    train_file_names = train_file_names[val_cutoff:]
+    train_cutoff = [int(len(train_tags)/part_num)*i for i in range(part_num)] + [len(train_tags)]
+    for part in range(part_num):
+        start, end = train_cutoff[part], train_cutoff[part+1]
+        _save_dataset(train_tags[start:end], train_file_names[start:end], word_to_idx, tag_names,
+                      max_length, './data/train/train.dataset81_%s.npz' % str(part))
+    print "Finished building NUS-WIDE Lite datasets"
+
+if __name__ == "__main__":
+    main()
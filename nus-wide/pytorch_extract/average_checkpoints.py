@@ -0,0 +1,10 @@
+import sys
+import torch
+from weight_averaging import average_checkpoints
+
+# python average_checkpoints.py <save_path> <checkpoint> [<checkpoint> ...]
+# e.g. python average_checkpoints.py model/resnet_init_pred_avg.pth.tar model/resnet_init_pred_{46..50}.pth.tar
+save_path = sys.argv[1]
+checkpoints = sys.argv[2:]
+torch.save(average_checkpoints(checkpoints), save_path)
+print "Averaged %d checkpoints into %s" % (len(checkpoints), save_path)
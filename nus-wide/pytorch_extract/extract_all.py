@@ -0,0 +1,64 @@
+import sys
+from torch.autograd import Variable
+import os
+import numpy as np
+import hickle
+import torch
+import torch.nn as nn
+import torch.nn.parallel
+import torch.utils.data
+from image_loader import *
+from resnet_extractor import *
+from feature_writer import FeatureWriter
+os.environ['CUDA_VISIBLE_DEVICES'] = '0'
+
+# python extract_all.py lite: the NUS-WIDE Lite layout prepro_tags81.py writes under ./data
+# instead of the full one prepro_nus.py writes under ./nusdata
+lite = len(sys.argv) > 1 and sys.argv[1] == 'lite'
+if lite:
+    data_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/data'
+    pooled_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/feature_2048_lite'
+else:
+    data_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata'
+    pooled_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/feature_2048'
+
+# every tap is written from the same decode and trunk pass; each save path is filled with
+# (split, split, part suffix). e.g. add (FeatureTap('layer3', channels=512), ...) for [196, 512]
+# features, (FeatureTap('layer4'), ...) for [49, 2048] ones or
+# (FeatureTap('layer3', basis=<prepro_pca.py basis>), ...) for PCA-reduced [196, 256] ones
+n_classes = 81
+taps = [(FeatureTap('layer3'), os.path.join(data_path, '%s', '%s.features81%s.hkl')),
+        (FeatureTap('layer4', grid=1), os.path.join(pooled_path, '%s', '%s.features81%s.hkl')),
+        (FeatureTap('fc'), os.path.join(data_path, '%s', '%s.init.pred81%s.hkl'))]
+extractor = ResnetExtractor(n_classes, [tap for tap, _ in taps], head_path='model/resnet_init_pred_5.pth.tar')
+extractor = nn.DataParallel(extractor).cuda()
+
+# number of parts of each split as written by prepro_nus.py and prepro_split_test.py, or by
+# prepro_tags81.py for Lite (0: one unparted file), the layout load_nus_data reads
+if lite:
+    split_parts = {'train': 16, 'val': 0, 'test': 0}
+else:
+    split_parts = {'train': 50, 'val': 0, 'test': 10}
+batch_size = 128
+
+splits = []
+for split in ['train', 'val', 'test']:
+    if split_parts[split] == 0:
+        splits.append((split, ''))
+    else:
+        splits += [(split, '_%s' % str(part)) for part in range(split_parts[split])]
+for split, suffix in splits:
+    print "%s%s features" % (split, suffix)
+    anno_path = os.path.join(data_path, split, '%s.annotations81%s.pkl' % (split, suffix))
+    image_path = load_image_path(anno_path)
+    n_examples = len(image_path)
+
+    save_paths = [save_path % (split, split, suffix) for _, save_path in taps]
+    writer = FeatureWriter(save_paths, [tap.row_shape(n_classes) for tap, _ in taps], n_examples)
+    for image_batch in image_loader(image_path[writer.n_done:], batch_size):
+        image_var = Variable(image_batch.cuda(async=True), volatile=True)
+        feats = extractor(image_var)
+        writer.append(*[tap.project(feat.data.cpu().numpy()) for (tap, _), feat in zip(taps, feats)])
+        print ("Processed %d %s features.." % (writer.n_done, split))
+    writer.close()
+    print ("Saved %s.." % (', '.join(save_paths)))
@@ -4,6 +4,7 @@ sys.path.append('/home/jason6582/sfyc/attention-tensorflow/nus-wide')
 from scipy import ndimage
 from torch.autograd import Variable
 from core.utils_nus import *
+from image_loader import *
 import os
 import time
 import numpy as np
@@ -18,6 +19,7 @@ import torch.utils.data
 import torchvision.transforms as transforms
 import torchvision.datasets as dset
 import torchvision.models as models
+from weight_averaging import WeightEMA
 os.environ['CUDA_VISIBLE_DEVICES'] = '1'
 
 resnet152 = models.resnet152(pretrained=True)
@@ -31,6 +33,10 @@ training_epoch = 10
 save_every = 1
 part_num = 50
 batch_size = 16
+# set to also save an exponential moving average of the head weights every epoch
+# (resnet_*_ema_<epoch>.pth.tar); it costs one extra weight update per step
+use_ema = False
+ema_decay = 0.999
 
 criterion = nn.BCELoss().cuda()
 optimizer = torch.optim.SGD(resnet152.fc.parameters(),
@@ -43,6 +49,8 @@ optimizer = torch.optim.Adam(resnet152.fc.parameters(),
                             )
 '''
 resnet152 = nn.DataParallel(resnet152).cuda()
+if use_ema:
+    ema = WeightEMA(resnet152.module.fc, ema_decay)
 # Training part
 split = 'train'
 prev_loss = []
@@ -59,19 +67,13 @@ for epoch in range(training_epoch):
         print "part", part, "of epoch %d" % (epoch+1)
         anno_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata/%s/%s.annotations81_%s.pkl'\
                     % (split, split, str(part))
-        with open(anno_path, 'rb') as f:
-            annotations = pickle.load(f)
-        image_path = list(annotations['file_name'].unique())
+        image_path = load_image_path(anno_path)
         n_examples = len(image_path)
 
         data_path = '/home/jason6582/sfyc/attention-tensorflow/nus-wide/nusdata'
         data = load_nus_data(data_path=data_path, split='train', part=str(part))
         captions = data['captions']
-        groundtruth = np.zeros((n_examples, 81), dtype=np.float32)
-        for n, caption in enumerate(captions):
-            for index in caption:
-                if index > 2:
-                    groundtruth[n][index-3] = 1.0
+        groundtruth = label_matrix(data, 81)
 
         all_feats = np.ndarray([n_examples, 196, 1024], dtype=np.float32)
 
@@ -94,6 +96,8 @@ for epoch in range(training_epoch):
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
+            if use_ema:
+                ema.update()
         print "Previous epoch loss (part %s): " % str(part+1), prev_loss[part]
         print "Current epoch loss (part %s): " % str(part+1), curr_loss[part]
         print "Elapsed time: ", time.time() - start_time
@@ -103,4 +107,8 @@ for epoch in range(training_epoch):
         filename = 'model/resnet_init_pred_%s.pth.tar' % str(epoch+1)
         print filename, 'saved.\n'
         torch.save(resnet152.state_dict(), filename)
+        if use_ema:
+            filename = 'model/resnet_init_pred_ema_%s.pth.tar' % str(epoch+1)
+            print filename, 'saved.\n'
+            torch.save(ema.apply(resnet152.state_dict(), 'module.fc.'), filename)
 
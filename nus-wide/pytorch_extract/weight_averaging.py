@@ -0,0 +1,33 @@
+import torch
+
+
+class WeightEMA(object):
+    """Exponential moving average of a module's parameters, updated after every optimizer step."""
+    def __init__(self, module, decay=0.999):
+        self.module = module
+        self.decay = decay
+        self.shadow = dict((name, param.data.clone()) for name, param in module.named_parameters())
+
+    def update(self):
+        for name, param in self.module.named_parameters():
+            self.shadow[name].mul_(self.decay).add_(1.0 - self.decay, param.data)
+
+    def apply(self, state_dict, prefix=''):
+        # copy of a full model state_dict with the averaged weights of the module under prefix
+        state_dict = dict(state_dict.items())
+        for name, value in self.shadow.items():
+            state_dict[prefix + name] = value.clone()
+        return state_dict
+
+
+def average_checkpoints(paths):
+    # element-wise mean of saved state_dicts (loaded on the CPU); integer buffers are taken
+    # from the last one
+    state_dicts = [torch.load(path, map_location=lambda storage, loc: storage) for path in paths]
+    averaged = {}
+    for key, value in state_dicts[-1].items():
+        if isinstance(value, (torch.FloatTensor, torch.DoubleTensor)):
+            averaged[key] = sum(state_dict[key] for state_dict in state_dicts) / float(len(state_dicts))
+        else:
+            averaged[key] = value
+    return averaged
@@ -15,9 +15,12 @@ print '#########################'
 
 def main():
     word_to_idx = load_word_to_idx(data_path='./nusdata', split='train')
-    val_data = load_nus_data(data_path='./nusdata', split='val', load_init_pred=True)
+    # PCA-reduced features from prepro_pca.py: features = 'features81_pca256', dim_feature = [196, 256]
+    features = 'features81'
+    dim_feature = [196, 1024]
+    val_data = load_nus_data(data_path='./nusdata', split='val', load_init_pred=True, features=features)
     # test_data = load_nus_data(data_path='./nusdata', split='test', load_init_pred=True)
-    model = CaptionGenerator(word_to_idx, dim_feature=[196, 1024], dim_embed=64,
+    model = CaptionGenerator(word_to_idx, dim_feature=dim_feature, dim_embed=64,
                             dim_hidden=1024, n_time_step=11, prev2out=True,
                             ctx2out=True, alpha_c=1.0, selector=True, dropout=True)
     data_path = './nusdata'
@@ -6,7 +6,10 @@ os.environ['CUDA_VISIBLE_DEVICES']='0'
 
 def main():
     word_to_idx = load_word_to_idx(data_path='./nusdata', split='train')
-    model = CaptionGenerator(word_to_idx, dim_feature=[196, 1024], dim_embed=64,
+    # PCA-reduced features from prepro_pca.py: features = 'features81_pca256', dim_feature = [196, 256]
+    features = 'features81'
+    dim_feature = [196, 1024]
+    model = CaptionGenerator(word_to_idx, dim_feature=dim_feature, dim_embed=64,
                             dim_hidden=1024, n_time_step=11, prev2out=True,
                             ctx2out=True, alpha_c=1.0, selector=True, dropout=True)
     data_path = './nusdata'
@@ -14,7 +17,7 @@ def main():
                 update_rule='adam', learning_rate=0.0003, print_every=30, save_every=1,
                 pretrained_model='model/nus_init_pred-22', model_path='model/',
                 test_model='model/model-1', print_bleu=True, log_path='log/', V=len(word_to_idx),\
-                n_time_step=11)
+                n_time_step=11, features=features)
     solver.train()
 
 if __name__ == "__main__":
@@ -0,0 +1,548 @@
+import numpy as np
+import itertools
+import os
+import re
+import time
+
+# Multi-label metrics on [N, C] matrices. Candidates and references are turned into per-image
+# label counts once (label_counts) and every overall and per-class number is a reduction over
+# the image axis. Duplicated labels count as often as they appear, as in the old per-image loops.
+
+
+def threshold_predictions(scores, thresholds):
+    # [T, N, C] candidate labels: scores above each threshold, or the argmax when none is;
+    # thresholds is [T] global or [T, C] per-class thresholds
+    scores = np.asarray(scores)
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    candidates = scores[np.newaxis] > thresholds.reshape(len(thresholds), 1, -1)
+    t_idx, n_idx = np.nonzero(~candidates.any(axis=2))
+    candidates[t_idx, n_idx, np.argmax(scores, axis=1)[n_idx]] = True
+    return candidates
+
+
+def label_counts(label_lists, n_classes):
+    # [N, C] number of times each class (0-based) appears in each image's label list
+    lengths = np.fromiter((len(labels) for labels in label_lists), dtype=np.int64, count=len(label_lists))
+    rows = np.repeat(np.arange(len(label_lists)), lengths)
+    cols = np.fromiter(itertools.chain.from_iterable(label_lists), dtype=np.int64, count=lengths.sum())
+    counts = np.bincount(rows * n_classes + cols, minlength=len(label_lists) * n_classes)
+    return counts.reshape(len(label_lists), n_classes).astype(np.int32)
+
+
+def _summarize(cans_num, refs_num, correct_num):
+    # metrics from per-class predicted / true / correct counts of shape [..., C];
+    # classes never predicted / never present count as 1 in the per-class denominators
+    cans_num = np.asarray(cans_num, dtype=np.float64)
+    refs_num = np.asarray(refs_num, dtype=np.float64)
+    correct_num = np.asarray(correct_num, dtype=np.float64)
+    o_p = correct_num.sum(axis=-1) / cans_num.sum(axis=-1)
+    o_r = correct_num.sum(axis=-1) / refs_num.sum(axis=-1)
+    c_p = np.mean(correct_num / np.maximum(cans_num, 1.0), axis=-1)
+    c_r = np.mean(correct_num / np.maximum(refs_num, 1.0), axis=-1)
+    o_f1 = 2.0/((1.0/o_r) + (1.0/o_p))
+    c_f1 = 2.0/((1.0/c_r) + (1.0/c_p))
+    return {'o_p': o_p, 'o_r': o_r, 'o_f1': o_f1, 'c_p': c_p, 'c_r': c_r, 'c_f1': c_f1,
+            'average': (c_f1 + o_f1) / 2, 'class_cans': cans_num, 'class_refs': refs_num,
+            'class_correct': correct_num}
+
+
+def multilabel_metrics(scores, targets, thresholds):
+    # O-P/O-R/O-F1 and C-P/C-R/C-F1 of [N, C] scores against [N, C] 0/1 targets,
+    # one entry per threshold
+    targets = np.asarray(targets, dtype=bool)
+    candidates = threshold_predictions(scores, thresholds)
+    cans_num = candidates.sum(axis=1)
+    refs_num = np.tile(targets.sum(axis=0), (len(candidates), 1))
+    correct_num = (candidates & targets[np.newaxis]).sum(axis=1)
+    return _summarize(cans_num, refs_num, correct_num)
+
+
+def count_metrics(cand_counts, ref_counts):
+    # metrics of [N, C] candidate label counts against [N, C] reference label counts;
+    # every predicted copy of a class present in the image is correct
+    cand_counts = np.asarray(cand_counts)
+    ref_counts = np.asarray(ref_counts)
+    correct_num = (cand_counts * (ref_counts > 0)).sum(axis=0)
+    return _summarize(cand_counts.sum(axis=0), ref_counts.sum(axis=0), correct_num)
+
+
+def score_metrics(scores, ref_counts, thres):
+    # metrics of the labels scoring above thres (argmax if none does) in [N, C] scores
+    candidates = threshold_predictions(scores, thres)[0]
+    return count_metrics(candidates, np.asarray(ref_counts)[:len(candidates)])
+
+
+class StreamingEvaluator(object):
+    # running per-class TP / FP / FN of a split decoded image by image, so O-F1 / C-F1 can be
+    # printed while the solvers' test() runs and the final metrics exist as soon as it ends,
+    # without writing a candidate pickle for evaluate.py. ref_counts are the [N, C] reference
+    # label counts of the split in decoding order; metrics cover the images seen so far.
+    def __init__(self, ref_counts):
+        self.ref_counts = np.asarray(ref_counts)
+        n_classes = self.ref_counts.shape[1]
+        self.start_t = time.time()
+        self.n_images = 0
+        self.tp = np.zeros(n_classes, dtype=np.int64)
+        self.fp = np.zeros(n_classes, dtype=np.int64)
+        self.fn = np.zeros(n_classes, dtype=np.int64)
+
+    def update(self, label_lists):
+        # 0-based label lists of the next images, e.g. all_sam_cap[-1:]
+        self.update_counts(label_counts(label_lists, len(self.tp)))
+
+    def update_counts(self, cand_counts):
+        # [b, C] candidate label counts of the next b images
+        cand_counts = np.asarray(cand_counts)
+        ref_counts = self.ref_counts[self.n_images:self.n_images + len(cand_counts)]
+        correct = (cand_counts * (ref_counts > 0)).sum(axis=0)
+        self.tp += correct
+        self.fp += cand_counts.sum(axis=0) - correct
+        self.fn += ref_counts.sum(axis=0) - correct
+        self.n_images += len(cand_counts)
+
+    def metrics(self):
+        # count_metrics of the images seen so far
+        return _summarize(self.tp + self.fp, self.tp + self.fn, self.tp)
+
+    def status(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            metrics = self.metrics()
+        return 'images: %d, O-F1: %.4f, C-F1: %.4f' % (self.n_images, metrics['o_f1'], metrics['c_f1'])
+
+
+def threshold_curve(scores, targets, thresholds):
+    # multilabel_metrics of [N, C] scores at each of the ascending [T] thresholds in one pass:
+    # each score is bucketed by the number of thresholds below it and per-class counts above
+    # each threshold are cumulative sums of the bucket histograms. Images whose best score
+    # is not above a threshold add their argmax class, as in threshold_predictions.
+    scores = np.asarray(scores, dtype=np.float64)
+    targets = np.asarray(targets) > 0
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    if np.any(np.diff(thresholds) < 0):
+        raise ValueError('thresholds must be ascending')
+    n_images, n_classes = scores.shape
+    n_bins = (len(thresholds) + 1) * n_classes
+    # score > thresholds[j] exactly for j < bucket
+    bucket = np.searchsorted(thresholds, scores, side='left') * n_classes + np.arange(n_classes)
+    hist = np.bincount(bucket.ravel(), minlength=n_bins).reshape(-1, n_classes)
+    hist_tp = np.bincount(bucket.ravel(), weights=targets.ravel(), minlength=n_bins).reshape(-1, n_classes)
+    above = np.cumsum(hist[::-1], axis=0)[::-1][1:]
+    above_tp = np.cumsum(hist_tp[::-1], axis=0)[::-1][1:]
+    # max score <= thresholds[j] exactly for j >= bucket
+    best = np.argmax(scores, axis=1)
+    best_bucket = np.searchsorted(thresholds, scores[np.arange(n_images), best], side='left') * n_classes + best
+    fallback = np.cumsum(np.bincount(best_bucket, minlength=n_bins).reshape(-1, n_classes), axis=0)[:-1]
+    fallback_tp = np.cumsum(np.bincount(best_bucket, weights=targets[np.arange(n_images), best],
+                                        minlength=n_bins).reshape(-1, n_classes), axis=0)[:-1]
+    refs_num = np.tile(targets.sum(axis=0), (len(thresholds), 1))
+    return _summarize(above + fallback, refs_num, above_tp + fallback_tp)
+
+
+def score_thresholds(scores, n_thresholds=1000):
+    # ascending thresholds for threshold_curve taken from the scores themselves: every distinct
+    # score, or n_thresholds evenly spaced quantiles of them when there are more
+    distinct = np.unique(np.asarray(scores, dtype=np.float64))
+    if len(distinct) <= n_thresholds:
+        return distinct
+    return distinct[np.round(np.linspace(0, len(distinct) - 1, n_thresholds)).astype(np.int64)]
+
+
+def class_f1(metrics):
+    # per-class F1 from the class counts of a metrics dict; 0 for classes never predicted nor present
+    denominator = metrics['class_cans'] + metrics['class_refs']
+    return 2.0 * metrics['class_correct'] / np.maximum(denominator, 1.0)
+
+
+def best_thresholds(curve, thresholds):
+    # thresholds of a threshold_curve maximizing O-F1, C-F1 and each class's own F1
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return {'o_f1': thresholds[np.nanargmax(curve['o_f1'])],
+            'c_f1': thresholds[np.nanargmax(curve['c_f1'])],
+            'class': thresholds[np.argmax(class_f1(curve), axis=0)]}
+
+
+def error_matrices(cand_counts, ref_counts):
+    # [C, C] image counts from products of the [N, C] indicator matrices (exact in float32
+    # below 2**24 images):
+    #   'confusion'[i, j]: images where true class i was missed and class j predicted wrongly
+    #   'cooccurrence'[i, j]: images with both i and j among their references
+    predicted = np.asarray(cand_counts) > 0
+    present = np.asarray(ref_counts)[:len(predicted)] > 0
+    missed = (present & ~predicted).astype(np.float32)
+    wrong = (predicted & ~present).astype(np.float32)
+    present = present.astype(np.float32)
+    return {'confusion': np.dot(missed.T, wrong).astype(np.int64),
+            'cooccurrence': np.dot(present.T, present).astype(np.int64)}
+
+
+def set_size_calibration(cand_counts, ref_counts, max_size=6):
+    # [S, S] number of images by true (rows) and predicted (columns) label set size; sizes of
+    # max_size and above share the last row / column
+    pred_size = np.minimum(np.asarray(cand_counts).sum(axis=1), max_size)
+    true_size = np.minimum(np.asarray(ref_counts)[:len(pred_size)].sum(axis=1), max_size)
+    n_sizes = max_size + 1
+    return np.bincount(true_size * n_sizes + pred_size, minlength=n_sizes * n_sizes).reshape(n_sizes, n_sizes)
+
+
+def frequency_buckets(metrics, frequencies, n_buckets=4):
+    # classes split into n_buckets groups of (nearly) equal size by descending frequency, each
+    # with the _summarize metrics of its own classes
+    order = np.argsort(-np.asarray(frequencies), kind='mergesort')
+    return [(classes, _summarize(metrics['class_cans'][classes], metrics['class_refs'][classes],
+                                 metrics['class_correct'][classes]))
+            for classes in np.array_split(order, n_buckets)]
+
+
+def rank_labels(scores, depth=None):
+    # [N, depth] class ids of [N, C] scores, best first (equal scores keep class order)
+    order = np.argsort(-np.asarray(scores), axis=1, kind='mergesort')
+    return order[:, :depth]
+
+
+def pad_rankings(label_lists, depth=None):
+    # [N, depth] array of ordered label lists (the decoders' paths), padded with -1
+    lengths = np.fromiter((len(labels) for labels in label_lists), dtype=np.int64, count=len(label_lists))
+    depth = max(lengths.max(), 1) if depth is None else depth
+    lengths = np.minimum(lengths, depth)
+    ranked = np.full((len(label_lists), depth), -1, dtype=np.int64)
+    ranked[np.arange(depth) < lengths[:, np.newaxis]] = np.fromiter(
+        itertools.chain.from_iterable(labels[:depth] for labels in label_lists), dtype=np.int64, count=lengths.sum())
+    return ranked
+
+
+def ranking_metrics(ranked, ref_counts, ks=(1, 3, 5)):
+    # P@k, R@k and NDCG@k (binary gains) of [N, L] rankings of distinct class ids (rank_labels,
+    # pad_rankings) against [N, C] reference label counts, and label ranking average precision.
+    # Rankings shorter than k count as misses in P@k; for LRAP the classes a ranking leaves
+    # out share its last rank C. Images without references are left out.
+    relevant = np.asarray(ref_counts)[:len(ranked)] > 0
+    n_refs = relevant.sum(axis=1)
+    keep = n_refs > 0
+    relevant, n_refs = relevant[keep], n_refs[keep].astype(np.float64)
+    ranked = np.asarray(ranked)[keep]
+    depth = max(max(ks), ranked.shape[1])
+    hits = np.zeros((len(ranked), depth))
+    hits[:, :ranked.shape[1]] = (ranked >= 0) & relevant[np.arange(len(ranked))[:, np.newaxis], np.maximum(ranked, 0)]
+    positions = np.arange(1, depth + 1, dtype=np.float64)
+    found = np.cumsum(hits, axis=1)
+    discount = 1.0 / np.log2(positions + 1)
+    gain = np.cumsum(hits * discount, axis=1)
+    ideal = np.cumsum(discount)
+    metrics = {}
+    for k in ks:
+        metrics['p@%d' % k] = np.mean(found[:, k-1] / k)
+        metrics['r@%d' % k] = np.mean(found[:, k-1] / n_refs)
+        metrics['ndcg@%d' % k] = np.mean(gain[:, k-1] / ideal[np.minimum(n_refs, k).astype(np.int64) - 1])
+    # a relevant class at position p has found[p] relevant classes at or above it
+    ranked_precision = (hits * found / positions).sum(axis=1)
+    left_out = n_refs - found[:, -1]
+    metrics['lrap'] = np.mean((ranked_precision + left_out * n_refs / relevant.shape[1]) / n_refs)
+    return metrics
+
+
+def bootstrap_weights(n_images, n_boot, seed=0, chunk=100):
+    # [b, N] number of times each image is drawn in each of n_boot resamples, chunk at a time
+    rng = np.random.RandomState(seed)
+    for start in range(0, n_boot, chunk):
+        b = min(chunk, n_boot - start)
+        draws = rng.randint(0, n_images, (b, n_images)) + n_images * np.arange(b)[:, np.newaxis]
+        yield np.bincount(draws.ravel(), minlength=b * n_images).reshape(b, n_images).astype(np.float32)
+
+
+def _positive_ends(scores, targets):
+    # per class of a _rank ranking: the image order, the positive images in ranked order, the
+    # ranked position ending the tie of each positive and the last positive of that tie
+    order, hits, tie_end = _rank(scores, targets)
+    n_images = len(order)
+    positions = np.where(tie_end, np.arange(n_images)[:, np.newaxis], n_images - 1)
+    ends = np.minimum.accumulate(positions[::-1], axis=0)[::-1]
+    classes = []
+    for c in range(order.shape[1]):
+        pos = np.nonzero(hits[:, c])[0]
+        last = np.searchsorted(ends[pos, c], ends[pos, c], side='right') - 1
+        classes.append((order[:, c], order[pos, c], ends[pos, c], last))
+    return classes
+
+
+def _bootstrap_map(classes, weights, mode):
+    # [b] mAP under [b, N] image weights. Only the precision at the end of ties holding positives
+    # can set the interpolated precision, so per class this needs the weight of all images up
+    # to those ends (one cumulative sum) and the weights of the positives.
+    aps = []
+    for order, positives, ends, last in classes:
+        if len(positives) == 0:
+            continue
+        seen = np.cumsum(np.take(weights, order, axis=1), axis=1)[:, ends]
+        hits = weights[:, positives]
+        tp = np.cumsum(hits, axis=1, dtype=np.float64)
+        n_pos = tp[:, -1:]
+        precision = tp[:, last] / np.maximum(seen, 1.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if mode == 'voc07':
+                recall = tp[:, last] / n_pos
+                aps.append(np.mean([np.where(recall >= t, precision, 0.0).max(axis=1)
+                                    for t in np.linspace(0.0, 1.0, 11)], axis=0))
+            else:
+                envelope = np.maximum.accumulate(precision[:, ::-1], axis=1)[:, ::-1]
+                aps.append((hits * envelope).sum(axis=1) / n_pos[:, 0])
+    return np.nanmean(aps, axis=0)
+
+
+def bootstrap_metrics(systems, ref_counts, n_boot=1000, seed=0, mode='area'):
+    # O-F1, C-F1 and mAP of every system on n_boot resamples of the images. The per-image
+    # predicted / true / correct counts and the score rankings are computed once; a resample is
+    # a vector of image weights, so its class totals are one matrix product. Every system sees
+    # the same resamples, which makes the differences between systems paired.
+    #   systems: (cand_counts, scores) per system, [N, C] candidate label counts and [N, C]
+    #            scores, or None for systems without scores (their mAP is nan)
+    # returns {'o_f1': [S, n_boot], 'c_f1': [S, n_boot], 'map': [S, n_boot]}
+    ref_counts = np.asarray(ref_counts, dtype=np.float32)
+    n_classes = ref_counts.shape[1]
+    cached = []
+    for cand_counts, scores in systems:
+        cand_counts = np.asarray(cand_counts, dtype=np.float32)
+        classes = _positive_ends(scores, ref_counts > 0) if scores is not None else None
+        cached.append((np.hstack([cand_counts, cand_counts * (ref_counts > 0)]), classes))
+    replicates = dict((key, np.full((len(systems), n_boot), np.nan)) for key in ['o_f1', 'c_f1', 'map'])
+    start = 0
+    for weights in bootstrap_weights(len(ref_counts), n_boot, seed):
+        end = start + len(weights)
+        refs_num = np.dot(weights, ref_counts)
+        for s, (counts, classes) in enumerate(cached):
+            totals = np.dot(weights, counts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                metrics = _summarize(totals[:, :n_classes], refs_num, totals[:, n_classes:])
+            replicates['o_f1'][s, start:end] = metrics['o_f1']
+            replicates['c_f1'][s, start:end] = metrics['c_f1']
+            if classes is not None:
+                replicates['map'][s, start:end] = _bootstrap_map(classes, weights, mode)
+        start = end
+    return replicates
+
+
+def percentile_interval(replicates, alpha=0.05):
+    # (low, high) percentile bootstrap interval along the last axis
+    return np.nanpercentile(replicates, [100.0 * alpha / 2, 100.0 * (1 - alpha / 2)], axis=-1)
+
+
+def paired_bootstrap_test(replicates_a, replicates_b, alpha=0.05):
+    # mean difference b - a over paired resamples, its interval and the two-sided p-value of
+    # "no difference" (twice the share of resamples on the smaller side of zero)
+    diff = np.asarray(replicates_b) - np.asarray(replicates_a)
+    low, high = percentile_interval(diff, alpha)
+    p_value = min(1.0, 2.0 * min(np.mean(diff <= 0), np.mean(diff >= 0)))
+    return np.mean(diff), low, high, p_value
+
+
+def write_bootstrap(result_file, names, points, replicates, alpha=0.05):
+    # point estimate and interval of every system, then every system against the first
+    keys = [('O-F1', 'o_f1'), ('C-F1', 'c_f1'), ('mAP', 'map')]
+    with open(result_file, 'w') as g:
+        g.write('%d resamples, %s%% intervals\n\n' % (replicates['o_f1'].shape[1], str(100 * (1 - alpha))))
+        for s, name in enumerate(names):
+            g.write(name + ':\n')
+            for label, key in keys:
+                if not np.isnan(points[s][key]):
+                    low, high = percentile_interval(replicates[key][s], alpha)
+                    g.write('  %s: %.4f [%.4f, %.4f]\n' % (label, points[s][key], low, high))
+            g.write('\n')
+        for s in range(1, len(names)):
+            g.write('%s - %s:\n' % (names[s], names[0]))
+            for label, key in keys:
+                if not np.isnan(points[s][key]) and not np.isnan(points[0][key]):
+                    diff, low, high, p_value = paired_bootstrap_test(replicates[key][0], replicates[key][s], alpha)
+                    g.write('  %s: %+.4f [%+.4f, %+.4f] p = %.4f\n' % (label, diff, low, high, p_value))
+            g.write('\n')
+
+
+def format_metrics(metrics):
+    # the seven lines result.py reads back
+    lines = [('O-R', 'o_r'), ('O-P', 'o_p'), ('O-F1', 'o_f1'), ('C-R', 'c_r'), ('C-P', 'c_p'),
+             ('C-F1', 'c_f1'), ('Average', 'average')]
+    return ''.join('%s: %s\n' % (name, str(float(metrics[key]))) for name, key in lines)
+
+
+def _rank(scores, targets):
+    # per-class ranking of [N, C] scores: image order by descending score, the targets in that
+    # order and the last position of every run of equal scores
+    scores = np.asarray(scores, dtype=np.float64)
+    cols = np.arange(scores.shape[1])
+    order = np.argsort(-scores, axis=0, kind='mergesort')
+    sorted_scores = scores[order, cols]
+    hits = (np.asarray(targets) > 0)[order, cols].astype(np.float64)
+    tie_end = np.ones(scores.shape, dtype=bool)
+    tie_end[:-1] = sorted_scores[:-1] != sorted_scores[1:]
+    return order, hits, tie_end
+
+
+def _ranked_ap(hits, tie_end, weights, mode):
+    # AP of a _rank ranking; weights ([N, C] in ranked order, None for all ones) count every
+    # image that many times
+    if weights is None:
+        tp = np.cumsum(hits, axis=0)
+        seen = np.arange(1, len(hits) + 1, dtype=np.float64)[:, np.newaxis]
+    else:
+        hits = hits * weights
+        tp = np.cumsum(hits, axis=0)
+        seen = np.maximum(np.cumsum(weights, axis=0), 1.0)
+    precision = np.where(tie_end, tp / seen, 0.0)
+    n_pos = tp[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if mode == 'voc07':
+            recall = tp / n_pos
+            ap = np.mean([np.where(recall >= t, precision, 0.0).max(axis=0)
+                          for t in np.linspace(0.0, 1.0, 11)], axis=0)
+        else:
+            envelope = np.maximum.accumulate(precision[::-1], axis=0)[::-1]
+            ap = (hits * envelope).sum(axis=0) / n_pos
+    return np.where(n_pos > 0, ap, np.nan)
+
+
+def average_precision(scores, targets, mode='area'):
+    # per-class AP of [N, C] scores against [N, C] 0/1 targets. Images are ranked by descending
+    # score and equal scores form one rank: every positive in a tie gets the precision after the
+    # whole tie, so the result does not depend on the order of the images.
+    #   'area': mean over the positives of the interpolated precision (the running maximum of
+    #           precision from the bottom of the ranking), as evaluate_map always computed
+    #   'voc07': mean interpolated precision at recall 0, 0.1, ..., 1 (VOC2007 devkit)
+    # classes without positives are nan
+    order, hits, tie_end = _rank(scores, targets)
+    return _ranked_ap(hits, tie_end, None, mode)
+
+
+def mean_average_precision(scores, targets, mode='area'):
+    return np.nanmean(average_precision(scores, targets, mode))
+
+
+def write_map(result_file, ap, class_names):
+    # the layout evaluate_map wrote: one AP per class, then their mean
+    with open(result_file, 'w') as g:
+        for name, class_ap in zip(class_names, ap):
+            g.write(name + '\nmAP: ' + str(float(class_ap)) + '\n\n')
+        g.write('Average: ' + str(float(np.nanmean(ap))))
+
+
+def write_ranking(result_file, metrics, ks=(1, 3, 5)):
+    # P@k R@k NDCG@k per line, then LRAP
+    with open(result_file, 'w') as g:
+        for k in ks:
+            g.write('P@%d: %s\nR@%d: %s\nNDCG@%d: %s\n' % (k, str(float(metrics['p@%d' % k])), k,
+                    str(float(metrics['r@%d' % k])), k, str(float(metrics['ndcg@%d' % k]))))
+        g.write('LRAP: ' + str(float(metrics['lrap'])) + '\n')
+
+
+def write_result(result_file, metrics):
+    with open(result_file, 'w') as g:
+        g.write('Total number of true label: ' + str(int(metrics['class_refs'].sum())) + '\n')
+        g.write('Total number of predict label: ' + str(int(metrics['class_cans'].sum())) + '\n')
+        g.write('Number of correct prediction: ' + str(int(metrics['class_correct'].sum())) + '\n\n')
+        g.write(format_metrics(metrics))
+
+
+def write_iteration_results(result_file, iterations, ref_counts, thres):
+    # one block per refinement step of [n_iterations, N, C] scores, as the solvers' evaluate()
+    with open(result_file, 'w') as g:
+        for iter_num, scores in enumerate(iterations):
+            g.write('Iteration: ' + str(iter_num+1) + '\n')
+            g.write(format_metrics(score_metrics(scores, ref_counts, thres)) + '\n')
+
+
+def write_threshold_curve(result_file, thresholds, curve, class_names, class_metrics):
+    # the curve in the threshold_curve.txt layout (O-R O-P O-F1 C-R C-P C-F1 Average per
+    # threshold), the best global thresholds and the best threshold of every class;
+    # class_metrics are the metrics with every class at its own best threshold
+    best = best_thresholds(curve, thresholds)
+    keys = ['o_r', 'o_p', 'o_f1', 'c_r', 'c_p', 'c_f1', 'average']
+    f1 = class_f1(curve)
+    best_j = np.argmax(f1, axis=0)
+    with open(result_file, 'w') as g:
+        for j, thres in enumerate(thresholds):
+            g.write('  thres = %s: ' % str(float(thres)))
+            g.write(' '.join(str(round(float(curve[key][j]), 4)) for key in keys) + '\n')
+        g.write('\nbest O-F1: thres = %s\n' % str(float(best['o_f1'])))
+        g.write('best C-F1: thres = %s\n' % str(float(best['c_f1'])))
+        g.write('per-class thresholds: ' + ' '.join(str(round(float(class_metrics[key]), 4)) for key in keys) + '\n\n')
+        for c, name in enumerate(class_names):
+            g.write('%s: thres = %s, F1 = %s\n' % (name, str(float(best['class'][c])), str(round(float(f1[best_j[c], c]), 4))))
+
+
+def write_classwise(result_file, metrics, class_names):
+    # per-class counts, most correct predictions first
+    cans_num = np.maximum(metrics['class_cans'], 1.0)
+    refs_num = np.maximum(metrics['class_refs'], 1.0)
+    correct_num = metrics['class_correct']
+    order = np.argsort(correct_num, kind='mergesort')[::-1]
+    with open(result_file, 'w') as g:
+        for i, c in enumerate(order):
+            g.write(str(i) + ', ' + class_names[c] + ':\n')
+            g.write('--predicted: ' + str(cans_num[c]) + '\n')
+            g.write('--groundtruth: ' + str(refs_num[c]) + '\n')
+            g.write('--correct: ' + str(correct_num[c]) + '\n')
+            g.write('--recall: ' + str(correct_num[c] / refs_num[c]) + '\n')
+            g.write('--precision: ' + str(correct_num[c] / cans_num[c]) + '\n')
+
+
+def write_error_analysis(result_file, metrics, matrices, calibration, buckets, class_names, top=20):
+    # compact tables: F1 by frequency bucket, label set size calibration, the most frequent
+    # confusions and one line per class, most frequent class first
+    f1 = class_f1(metrics)
+    confusion = matrices['confusion']
+    n_images = calibration.sum()
+    with open(result_file, 'w') as g:
+        g.write('F1 by class frequency:\n')
+        g.write('  %-8s %7s %7s %7s %7s %7s\n' % ('classes', 'refs', 'O-P', 'O-R', 'O-F1', 'C-F1'))
+        first = 1
+        for classes, bucket in buckets:
+            g.write('  %-8s %7d %7.4f %7.4f %7.4f %7.4f\n' % ('%d-%d' % (first, first + len(classes) - 1),
+                    bucket['class_refs'].sum(), bucket['o_p'], bucket['o_r'], bucket['o_f1'], bucket['c_f1']))
+            first += len(classes)
+
+        sizes = [str(s) for s in range(len(calibration) - 1)] + ['%d+' % (len(calibration) - 1)]
+        g.write('\nlabel set size, true (rows) x predicted (columns):\n')
+        g.write('  %5s' % '' + ''.join('%7s' % size for size in sizes) + '\n')
+        for size, row in zip(sizes, calibration):
+            g.write('  %5s' % size + ''.join('%7d' % count for count in row) + '\n')
+        g.write('  mean true size: %.3f, mean predicted size: %.3f\n' % (metrics['class_refs'].sum() / n_images,
+                                                                       metrics['class_cans'].sum() / n_images))
+
+        g.write('\nmost frequent confusions (true class missed, other class predicted):\n')
+        pairs = np.argsort(-confusion.ravel(), kind='mergesort')[:top]
+        for i, j in zip(*np.unravel_index(pairs, confusion.shape)):
+            if confusion[i, j] > 0:
+                g.write('  %6d  %s -> %s (together in %d references)\n'
+                        % (confusion[i, j], class_names[i], class_names[j], matrices['cooccurrence'][i, j]))
+
+        g.write('\nper class:\n')
+        g.write('  %-16s %6s %6s %6s %7s %7s %7s  %s\n' % ('class', 'refs', 'pred', 'corr', 'P', 'R', 'F1', 'missed for'))
+        for c in np.argsort(-metrics['class_refs'], kind='mergesort'):
+            substitute = class_names[np.argmax(confusion[c])] if confusion[c].max() > 0 else '-'
+            g.write('  %-16s %6d %6d %6d %7.4f %7.4f %7.4f  %s\n' % (class_names[c], metrics['class_refs'][c],
+                    metrics['class_cans'][c], metrics['class_correct'][c],
+                    metrics['class_correct'][c] / max(metrics['class_cans'][c], 1.0),
+                    metrics['class_correct'][c] / max(metrics['class_refs'][c], 1.0), f1[c], substitute))
+
+
+def parse_run_name(path):
+    # (model, epoch, threshold) of <split>.candidate.captions[81]_<model>-<epoch>_<thres>.pkl,
+    # the names the solvers and evaluate.sh use; (file name, None, None) for other names
+    name = os.path.basename(path)
+    match = re.match(r'.*candidate\.captions\d*_(.+)-(\d+)_([0-9.]+)\.pkl$', name)
+    if match is None:
+        return name, None, None
+    return match.group(1), int(match.group(2)), float(match.group(3))
+
+
+def write_run_table(result_file, runs):
+    # result.py's layout for (model, epoch, threshold, metrics) runs: one line of
+    # O-R O-P O-F1 C-R C-P C-F1 Average per threshold, grouped by model and epoch
+    keys = ['o_r', 'o_p', 'o_f1', 'c_r', 'c_p', 'c_f1', 'average']
+    runs = sorted(runs, key=lambda run: run[:3])
+    with open(result_file, 'w') as g:
+        for model, model_runs in itertools.groupby(runs, key=lambda run: run[0]):
+            g.write('model = %s\n' % model)
+            for epoch, epoch_runs in itertools.groupby(model_runs, key=lambda run: run[1]):
+                g.write('epoch = %s:\n' % str(epoch))
+                for _, _, thres, metrics in epoch_runs:
+                    g.write('  thres = %s: ' % str(thres))
+                    g.write(' '.join(str(round(float(metrics[key]), 4)) for key in keys) + '\n')
+                g.write('\n')
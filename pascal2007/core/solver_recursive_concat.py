@@ -8,6 +8,7 @@ import os
 import cPickle as pickle
 from scipy import ndimage
 from utils_pascal import *
+from metrics import *
 
 
 class CaptioningSolver(object):
@@ -187,113 +188,19 @@ class CaptioningSolver(object):
             array[i] = 1/(1 + np.exp(-array[i]))
         return array
 
-    def evaluate_map(self, predict, split,resultFile):
-        predict = np.transpose(predict, (1, 0))
-        loaded_reference = load_pickle('/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata/%s/%s.references.pkl'\
-                                        % (split, split))
-        reference = np.zeros(predict.shape)
-        for key, value in loaded_reference.iteritems():
-            answer = []
-            for label in value[0]:
-                reference[label-3][key] = 1
-        g = open(resultFile, 'w')
-        word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata',\
-                      split='train')
-        idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
-        # feature = np.concatenate((feature, sum_feature))
+    def evaluate_map(self, predict, split, resultFile, mode='area'):
+        reference = reference_labels(load_pascal_references(data_path='/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata', split=split))
+        targets = label_counts(reference, 20) > 0
         label_list = ['aeroplane', 'bicycle', 'bird', 'boat', 'bottle', 'bus', 'car', 'cat', \
                       'chair', 'cow', 'dining_table', 'dog', 'horse', 'motorbike', 'person', \
                       'plant', 'sheep', 'sofa', 'train', 'tv']
-        all_map = []
-        for i, label in enumerate(label_list):
-            map_dic = {}
-            for j, instance in enumerate(reference[i]):
-                map_dic[predict[i][j]] = reference[i][j]
-            map_list = []
-            total_count = 0.0
-            correct_count = 0.0
-            for key in reversed(sorted(map_dic.iterkeys())):
-                total_count += 1.0
-                if map_dic[key] == 1:
-                    correct_count += 1.0
-                    map_list.append(correct_count/total_count)
-            l = len(map_list)
-            for i in range(l-1):
-                if map_list[l-i-1] > map_list[l-i-2]:
-                    map_list[l-i-2] = map_list[l-i-1]
-            all_map.append(sum(map_list)/len(map_list))
-            g.write(label + '\nmAP: ' + str(sum(map_list)/len(map_list)) + '\n\n')
-        g.write('Average: ' + str(sum(all_map)/len(all_map)))
+        write_map(resultFile, average_precision(predict, targets[:len(predict)], mode), label_list)
 
     def evaluate(self, feature, thres, split, resultFile):
-        loaded_reference = load_pickle('/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata/%s/%s.references.pkl'\
-                                        % (split,split))
-        reference = []
-        for key, value in loaded_reference.iteritems():
-            answer = []
-            for label in value[0]:
-                answer.append(label-3)
-            reference.append(answer)
-        g = open(resultFile, 'w')
-
-        word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata',\
-                      split='train')
-        idx_to_word = {i:w for w, i in word_to_idx.iteritems()}
+        reference = reference_labels(load_pascal_references(data_path='/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata', split=split))
         sum_feature = np.reshape(sum(feature)/5, (1, -1, 20))
         feature = np.concatenate((feature, sum_feature))
-
-        for iter_num, iteration in enumerate(feature):
-            refsNum = 0
-            cansNum = 0
-            correctNum = 0
-            classwise_num = np.zeros((3,20))
-            num = 0
-            for i in range(len(iteration)):
-                cans = []
-                for j, label in enumerate(iteration[i]):
-                    if label > thres:
-                        cans.append(j)
-                if len(cans) == 0:
-                    cans.append(int(np.argmax(iteration[i])))
-                cansNum += len(cans)
-                refs = reference[i]
-                refsNum += len(refs)
-                refsDict = {}
-                correct = 0
-                for c in cans:
-                    refsDict[c] = 0  # follow idx of word_to_idx (keep 0, 1, 2)
-                    classwise_num[0][c] += 1.0 # idx start from 0 for convenience
-                for r in refs:
-                    refsDict[r] = 1
-                    classwise_num[1][r] += 1.0
-                for c in cans:
-                    if refsDict[c] == 1:
-                        correct += 1
-                        classwise_num[2][c] += 1.0
-                correctNum += correct
-            recall = float(correctNum)/float(refsNum)
-            precision = float(correctNum)/float(cansNum)
-            o_f1 = 2.0/((1.0/recall) + (1.0/precision))
-            for i in range(len(classwise_num[0])):
-                if classwise_num[0][i] == 0.0:
-                    classwise_num[0][i] = 1.0
-            for i in range(len(classwise_num[1])):
-                if classwise_num[1][i] == 0.0:
-                    classwise_num[1][i] = 1.0
-            recall_arr = classwise_num[2] / classwise_num[1]
-            precision_arr = classwise_num[2] / classwise_num[0]
-            # precision_arr = np.divide(classwise_num[2], classwise_num[0])
-            c_recall = np.mean(recall_arr)
-            c_precision = np.mean(precision_arr)
-            c_f1 = 2.0/((1.0/c_recall) + (1.0/c_precision))
-            g.write('Iteration: ' + str(iter_num+1) + '\n')
-            g.write('O-R: ' + str(recall) + '\n')
-            g.write('O-P: ' + str(precision) + '\n')
-            g.write('O-F1: ' + str(o_f1) + '\n')
-            g.write('C-R: ' + str(c_recall) + '\n')
-            g.write('C-P: ' + str(c_precision) + '\n')
-            g.write('C-F1: ' + str(c_f1) + '\n')
-            g.write('Average: ' + str((c_f1+o_f1)/2) + '\n\n')
+        write_iteration_results(resultFile, feature, label_counts(reference, 20), thres)
 
     def test(self, data, split='train', attention_visualization=True, save_sampled_captions=True,\
              filename='', thres=0.0):
@@ -31,6 +31,14 @@ def load_pascal_data(data_path='./pascaldata', split='train', load_init_pred=Fal
     print "Elapse time: %.2f" %(end_t - start_t)
     return data
 
+def load_pascal_references(data_path='./pascaldata', split='val'):
+    # returns {image_idx: [[word index, ...]]} from %s.references.pkl
+    return load_pickle(os.path.join(data_path, split, '%s.references.pkl' % split))
+
+def reference_labels(references):
+    # 0-based class ids of each image, in image order (label = word index - 3)
+    return [[int(label) - 3 for label in references[i][0]] for i in range(len(references))]
+
 def decode_captions(captions, idx_to_word):
     # for i in idx_to_word.iteritems():
     #     print i
@@ -0,0 +1,28 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/pascal2007')
+
+# Per-class error analysis of a candidate file: F1 by class frequency bucket (frequencies of
+# the evaluated split's references), true versus predicted label set sizes, the most frequent
+# missed -> predicted confusions and a one-line summary per class:
+#   python analyze.py <candidate file> <result file> [split]
+
+candidateFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+n_buckets = 4
+
+from core.utils_pascal import *
+from core.metrics import *
+reference = reference_labels(load_pascal_references(data_path='..', split=split))
+candidate = load_pickle(candidateFile)
+class_names = ['aeroplane', 'bicycle', 'bird', 'boat', 'bottle', 'bus', 'car', 'cat', \
+                'chair', 'cow', 'dining_table', 'dog', 'horse', 'motorbike', 'person', \
+                'plant', 'sheep', 'sofa', 'train', 'tv']
+
+cand_counts = label_counts(candidate, 20)
+ref_counts = label_counts(reference[:len(candidate)], 20)
+metrics = count_metrics(cand_counts, ref_counts)
+write_error_analysis(resultFile, metrics, error_matrices(cand_counts, ref_counts),
+                     set_size_calibration(cand_counts, ref_counts),
+                     frequency_buckets(metrics, metrics['class_refs'], n_buckets), class_names)
@@ -0,0 +1,22 @@
+import sys
+import numpy as np
+sys.path.append('/home/jason6582/sfyc/attention-tensorflow/pascal2007')
+
+# P@k, R@k, NDCG@k and LRAP of raw [N, 20] scores (e.g. iterative_update-<e>_pred.pkl) ranked
+# per image:
+#   python ranking.py <scores.hkl|.pkl> <result file> [split]
+
+scoreFile = sys.argv[1]
+resultFile = sys.argv[2]
+split = sys.argv[3] if len(sys.argv) > 3 else 'test'
+
+from core.utils_pascal import *
+from core.metrics import *
+import hickle
+scores = hickle.load(scoreFile) if scoreFile.endswith('.hkl') else np.asarray(load_pickle(scoreFile))
+reference = reference_labels(load_pascal_references(data_path='..', split=split))
+
+ks = (1, 3, 5)
+metrics = ranking_metrics(rank_labels(scores), label_counts(reference, 20), ks)
+write_ranking(resultFile, metrics, ks)
+print 'R@3: %.4f' % metrics['r@3']
@@ -6,6 +6,7 @@ candidateFile = sys.argv[1]
 resultFile = sys.argv[2]
 
 from core.utils_pascal import *
+from core.metrics import *
 
 word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorflow/pascaldata',\
                             split='train')
@@ -13,24 +14,12 @@ word_to_idx = load_word_to_idx(data_path='/home/jason6582/sfyc/attention-tensorf
 idx_to_word = {i-3:w for w, i in word_to_idx.iteritems()}
 
 candidate = load_pickle(candidateFile)
-for i in range(20):
-    candidate[i] = sorted(candidate[i], key=lambda tup: tup[0])
-    candidate[i] = [t[1] for t in candidate[i]]
-    print idx_to_word[i]
-    print candidate[i]
-
-classwise_ap =[]
-mAP = []
 
-for i in range(len(candidate)):
-    temp_ap = []
-    for j in range(len(candidate[i])):
-        if candidate[i][j] == 1:
-            temp_ap.append(float(sum(candidate[i][j:])) / float(len(candidate[i][j:])))
-    for j in range(len(temp_ap)):
-        temp_ap[j] = max(temp_ap[:j+1])
-    #print len(temp_ap)
-    classwise_ap.append(sum(temp_ap)/float(len(temp_ap)))
+# candidate[i]: (score, is_positive) of every image for class i
+classwise_ap = []
+for i in range(20):
+    scores, hits = zip(*candidate[i])
+    classwise_ap.append(average_precision(np.array(scores)[:, np.newaxis], np.array(hits)[:, np.newaxis])[0])
 for i, key in enumerate(sorted(word_to_idx.keys())[3:]):
     print key + "     " +  str(classwise_ap[i])
 print sum(classwise_ap)/20.0
@@ -138,7 +138,8 @@ def main():
     # if word occurs less than word_count_threshold in training dataset, the word index is special unknown token.
     word_count_threshold = 1
     # vgg model path
-    # vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.mat'
+    # conv weights converted once from imagenet-vgg-verydeep-19.mat with python -m core.vggnet
+    # vgg_model_path = '/home/jason6582/sfyc/attention-tensorflow/imagenet-vgg-verydeep-19.npz'
 
     train_caption_file = '/home/jason6582/sfyc/pascal_json/pascal_train2007.json'
     val_caption_file = '/home/jason6582/sfyc/pascal_json/pascal_val2007.json'
@@ -195,6 +196,7 @@ def main():
     vggnet.build()
     with tf.Session() as sess:
         tf.initialize_all_variables().run()
+        vggnet.load_params(sess)
         for split in ['train', 'val', 'test']:
             anno_path = './pascaldata/%s/%s.annotations.pkl' % (split, split)
             save_path = './pascaldata/%s/%s.features.hkl' % (split, split)
@@ -0,0 +1,66 @@
+import os
+import time
+import torch
+import torch.distributed as dist
+
+
+def init_cpu_distributed(num_threads=None):
+    # one process per data shard, started with RANK, WORLD_SIZE, MASTER_ADDR and MASTER_PORT set
+    rank = int(os.environ['RANK'])
+    world_size = int(os.environ['WORLD_SIZE'])
+    dist.init_process_group(backend='gloo', init_method='env://', rank=rank, world_size=world_size)
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    return rank, world_size
+
+
+def broadcast_parameters(model):
+    # start every process from rank 0's weights (the new fc head is randomly initialized)
+    for param in model.state_dict().values():
+        dist.broadcast(param, 0)
+
+
+def all_reduce_gradients(model, world_size):
+    # average the gradients of all processes in one flattened all-reduce per step
+    grads = [param.grad.data for param in model.parameters() if param.grad is not None]
+    flat = torch.cat([grad.contiguous().view(-1) for grad in grads])
+    dist.all_reduce(flat, op=dist.reduce_op.SUM)
+    flat.div_(world_size)
+    offset = 0
+    for grad in grads:
+        grad.copy_(flat[offset:offset + grad.numel()].view_as(grad))
+        offset += grad.numel()
+
+
+def all_reduce_buffers(model, world_size):
+    # average the batch norm running statistics, which every process updates from its own
+    # shard only, so all processes (and the checkpoint rank 0 saves) hold the same ones
+    for key, buf in model.state_dict().items():
+        if 'running_' in key:
+            dist.all_reduce(buf, op=dist.reduce_op.SUM)
+            buf.div_(world_size)
+
+
+def module_state_dict(model):
+    # checkpoints keep the nn.DataParallel key names the extractors load
+    return dict(('module.' + key, value) for key, value in model.state_dict().items())
+
+
+class Throughput(object):
+    """Counts the images trained on since the last reset and reports images/s."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.time()
+        self.images = 0
+
+    def update(self, n):
+        self.images += n
+
+    def report(self, world_size=1):
+        elapsed = time.time() - self.start_time
+        total = torch.DoubleTensor([self.images])
+        if world_size > 1:
+            dist.all_reduce(total, op=dist.reduce_op.SUM)
+        return self.images / elapsed, total[0] / elapsed
@@ -0,0 +1,46 @@
+import sys
+from torch.autograd import Variable
+import os
+import numpy as np
+import hickle
+import torch
+import torch.nn as nn
+import torch.nn.parallel
+import torch.utils.data
+from image_loader import *
+from resnet_extractor import *
+from feature_writer import FeatureWriter
+os.environ['CUDA_VISIBLE_DEVICES'] = '0'
+
+data_path = '/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata'
+pooled_path = '/home/jason6582/sfyc/attention-tensorflow/pascal2007/feature_2048'
+
+# every tap is written from the same decode and trunk pass; each save path is filled with
+# (split, split, part suffix). e.g. add (FeatureTap('layer3', channels=512), ...) for [196, 512]
+# features, (FeatureTap('layer4'), ...) for [49, 2048] ones or
+# (FeatureTap('layer3', basis=<prepro_pca.py basis>), ...) for PCA-reduced [196, 256] ones
+n_classes = 20
+taps = [(FeatureTap('layer3'), os.path.join(data_path, '%s', '%s.features%s.hkl')),
+        (FeatureTap('layer4', grid=1), os.path.join(pooled_path, '%s', '%s.features%s.hkl')),
+        (FeatureTap('fc'), os.path.join(data_path, '%s', '%s.init.pred%s.hkl'))]
+extractor = ResnetExtractor(n_classes, [tap for tap, _ in taps], head_path='model/resnet_init_pred_30.pth.tar')
+extractor = nn.DataParallel(extractor).cuda()
+
+batch_size = 128
+
+splits = [('train', ''), ('val', ''), ('test', '')]
+for split, suffix in splits:
+    print "%s%s features" % (split, suffix)
+    anno_path = os.path.join(data_path, split, '%s.annotations%s.pkl' % (split, suffix))
+    image_path = load_image_path(anno_path)
+    n_examples = len(image_path)
+
+    save_paths = [save_path % (split, split, suffix) for _, save_path in taps]
+    writer = FeatureWriter(save_paths, [tap.row_shape(n_classes) for tap, _ in taps], n_examples)
+    for image_batch in image_loader(image_path[writer.n_done:], batch_size):
+        image_var = Variable(image_batch.cuda(async=True), volatile=True)
+        feats = extractor(image_var)
+        writer.append(*[tap.project(feat.data.cpu().numpy()) for (tap, _), feat in zip(taps, feats)])
+        print ("Processed %d %s features.." % (writer.n_done, split))
+    writer.close()
+    print ("Saved %s.." % (', '.join(save_paths)))
@@ -0,0 +1,88 @@
+import json
+import os
+import numpy as np
+import hickle
+
+
+class FeatureWriter(object):
+    """Appends per-image feature chunks to on-disk <save_path>.partial files instead of one
+    in-memory array per part. <first save_path>.progress records how many rows are complete, so
+    a killed extraction resumes after the last finished chunk; close() then dumps each array to
+    hickle and renames it into place, so a save_path only ever exists once it is complete. An
+    existing save_path is never written again: a run killed while close() finalizes the outputs
+    one by one resumes with the remaining ones.
+    """
+    def __init__(self, save_paths, row_shapes, n_examples, dtype=np.float32):
+        self.save_paths = save_paths
+        self.row_shapes = [tuple(row_shape) for row_shape in row_shapes]
+        self.n_examples = n_examples
+        self.dtype = np.dtype(dtype)
+        self.manifest_path = save_paths[0] + '.progress'
+        self.done = [os.path.exists(save_path) for save_path in save_paths]
+        self.finished = all(self.done)
+        self.n_done = self.n_examples if self.finished else self._load_manifest()
+        self.files = []
+        if not self.finished:
+            # drop any rows written after the last manifest update; finished outputs get no file
+            for save_path, row_shape, done in zip(self.save_paths, self.row_shapes, self.done):
+                f = None
+                if not done:
+                    f = open(save_path + '.partial', 'ab')
+                    f.truncate(self.n_done * self._row_bytes(row_shape))
+                self.files.append(f)
+
+    def _row_bytes(self, row_shape):
+        return int(np.prod(row_shape)) * self.dtype.itemsize
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return 0
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['n_examples'] != self.n_examples or \
+                [tuple(row_shape) for row_shape in manifest['row_shapes']] != self.row_shapes:
+            return 0
+        if manifest.get('finalizing'):
+            return self.n_examples
+        return manifest['n_done']
+
+    def _save_manifest(self, finalizing=False):
+        manifest = {'n_done': self.n_done, 'n_examples': self.n_examples, 'finalizing': finalizing,
+                    'row_shapes': [list(row_shape) for row_shape in self.row_shapes]}
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.rename(self.manifest_path + '.tmp', self.manifest_path)
+
+    def append(self, *chunks):
+        # one chunk per save_path, all covering the same next rows
+        for f, chunk, row_shape in zip(self.files, chunks, self.row_shapes):
+            if f is None:
+                continue
+            f.write(np.ascontiguousarray(chunk, dtype=self.dtype).reshape((-1,) + row_shape).tostring())
+            f.flush()
+            os.fsync(f.fileno())
+        self.n_done += len(chunks[0])
+        self._save_manifest()
+
+    def close(self):
+        if self.finished:
+            return
+        for f in self.files:
+            if f is not None:
+                f.close()
+        if self.n_done < self.n_examples:
+            return
+        # every row is on disk: from here on a restart only finalizes the missing outputs
+        self._save_manifest(finalizing=True)
+        for save_path, row_shape in zip(self.save_paths, self.row_shapes):
+            if os.path.exists(save_path):
+                continue
+            feats = np.memmap(save_path + '.partial', dtype=self.dtype, mode='r',
+                              shape=(self.n_examples,) + row_shape)
+            # use hickle to save huge feature vectors
+            hickle.dump(np.asarray(feats), save_path + '.tmp')
+            del feats
+            os.rename(save_path + '.tmp', save_path)
+            os.remove(save_path + '.partial')
+        os.remove(self.manifest_path)
+        self.finished = True
@@ -0,0 +1,102 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torchvision.models as models
+
+# output channels and grid size of each ResNet-152 stage for 224x224 inputs
+LAYER_CHANNELS = {'layer1': 256, 'layer2': 512, 'layer3': 1024, 'layer4': 2048}
+LAYER_GRID = {'layer1': 56, 'layer2': 28, 'layer3': 14, 'layer4': 7}
+LAYERS = ['conv1', 'bn1', 'relu', 'maxpool', 'layer1', 'layer2', 'layer3', 'layer4']
+
+
+class FeatureTap(object):
+    """One feature written by ResnetExtractor:
+        layer: 'layer1'..'layer4' of ResNet-152, or 'fc' for the sigmoid init-prediction head
+        grid: average-pool the layer to grid x grid locations, giving [grid*grid, C] rows, or to
+              a single [C] vector with grid=1; None keeps the layer's own grid
+        channels: average groups of consecutive channels down to this many; None keeps all
+        basis: npz with a 'mean' and [dim, C] 'components' (prepro_pca.py) projecting the
+               channels down to dim before the rows are stored; None keeps them as they are
+    e.g. FeatureTap('layer3') is the [196, 1024] attention feature, FeatureTap('layer4', grid=1)
+    the pooled [2048] one and FeatureTap('layer3', channels=512) a [196, 512] one.
+    """
+    def __init__(self, layer, grid=None, channels=None, basis=None):
+        if layer != 'fc' and layer not in LAYER_CHANNELS:
+            raise ValueError("layer must be 'fc' or one of %s" % ', '.join(sorted(LAYER_CHANNELS)))
+        if channels is not None and layer == 'fc':
+            raise ValueError("channels can't be set for the 'fc' tap")
+        if channels is not None and (channels <= 0 or LAYER_CHANNELS[layer] % channels != 0):
+            raise ValueError('channels must divide the %d channels of %s' % (LAYER_CHANNELS[layer], layer))
+        self.layer = layer
+        self.grid = grid
+        self.channels = channels
+        self.basis = dict(np.load(basis)) if basis is not None else None
+
+    def row_shape(self, n_classes):
+        if self.layer == 'fc':
+            return [n_classes]
+        grid = self.grid if self.grid is not None else LAYER_GRID[self.layer]
+        channels = self.channels if self.channels is not None else LAYER_CHANNELS[self.layer]
+        if self.basis is not None:
+            channels = self.basis['components'].shape[0]
+        return [channels] if grid == 1 else [grid * grid, channels]
+
+    def apply(self, x):
+        if self.layer == 'fc':
+            return x
+        if self.grid is not None and self.grid != x.size(2):
+            x = F.adaptive_avg_pool2d(x, self.grid)
+        if self.channels is not None and self.channels != x.size(1):
+            x = x.view(x.size(0), self.channels, -1, x.size(2), x.size(3)).mean(2)
+        if x.size(2) * x.size(3) == 1:
+            return x.view(x.size(0), -1)
+        # (N, C, H, W) -> (N, H*W, C)
+        return x.view(x.size(0), x.size(1), -1).transpose(1, 2).contiguous()
+
+    def project(self, feats):
+        # numpy rows from apply() -> rows stored on disk
+        if self.basis is None:
+            return feats
+        return np.dot(feats - self.basis['mean'], self.basis['components'].T)
+
+
+class ResnetExtractor(nn.Module):
+    """ResNet-152 run once per batch, returning the output of every tap in taps.
+    The trunk only runs up to the deepest tapped layer. An 'fc' tap adds the sigmoid
+    init-prediction head on the pooled layer4 output, loaded from an init-pred checkpoint on top
+    of the ImageNet trunk; that is exact for heads trained with a frozen trunk (train_fc.py,
+    train_init_pred.py), checkpoints from full fine-tuning (tune_resnet.py) still need
+    extract_init_*.py.
+    """
+    def __init__(self, n_classes, taps, head_path=None):
+        super(ResnetExtractor, self).__init__()
+        self.taps = taps
+        tapped = set(tap.layer for tap in taps)
+        self.use_head = 'fc' in tapped
+        if self.use_head:
+            tapped.add('layer4')
+        depth = max(LAYERS.index(layer) for layer in tapped if layer != 'fc') + 1
+        resnet152 = models.resnet152(pretrained=True)
+        self.layer_names = LAYERS[:depth]
+        self.trunk = nn.Sequential(*[getattr(resnet152, name) for name in self.layer_names])
+        if self.use_head:
+            self.avgpool = resnet152.avgpool
+            self.fc = nn.Sequential(nn.Linear(2048, n_classes), nn.Sigmoid())
+            if head_path is not None:
+                self.load_head(head_path)
+
+    def load_head(self, head_path):
+        # checkpoints are state_dicts of nn.DataParallel(resnet152) with fc = Sequential(Linear, Sigmoid)
+        state_dict = torch.load(head_path)
+        self.fc[0].weight.data.copy_(state_dict['module.fc.0.weight'])
+        self.fc[0].bias.data.copy_(state_dict['module.fc.0.bias'])
+
+    def forward(self, x):
+        outputs = {}
+        for name, layer in zip(self.layer_names, self.trunk):
+            x = layer(x)
+            outputs[name] = x
+        if self.use_head:
+            outputs['fc'] = self.fc(self.avgpool(x).view(x.size(0), -1))
+        return tuple(tap.apply(outputs[tap.layer]) for tap in self.taps)
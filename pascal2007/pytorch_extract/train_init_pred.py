@@ -18,6 +18,8 @@ import torch.utils.data
 import torchvision.transforms as transforms
 import torchvision.datasets as dset
 import torchvision.models as models
+from cpu_distributed import *
+from weight_averaging import WeightEMA
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 
 resnet152 = models.resnet152(pretrained=True)
@@ -30,18 +32,36 @@ resnet152.fc = nn.Sequential(*layers)
 training_epoch = 50
 save_every = 1
 batch_size = 16
-
-criterion = nn.BCELoss().cuda()
+# set to also save an exponential moving average of the head weights every epoch
+# (resnet_*_ema_<epoch>.pth.tar); it costs one extra weight update per step
+use_ema = False
+ema_decay = 0.999
+
+# CPU data-parallel mode: launch one process per shard with RANK, WORLD_SIZE, MASTER_ADDR and
+# MASTER_PORT set; each process trains on every world_size-th image of the epoch's shuffle, the fc
+# gradients are averaged over gloo and the batch norm statistics once per epoch
+cpu_distributed = 'WORLD_SIZE' in os.environ
+if cpu_distributed:
+    rank, world_size = init_cpu_distributed()
+    broadcast_parameters(resnet152)
+else:
+    rank, world_size = 0, 1
+
+criterion = nn.BCELoss() if cpu_distributed else nn.BCELoss().cuda()
 
 optimizer = torch.optim.SGD(resnet152.fc.parameters(),
                             0.1, # Learning rate
                             momentum=0.9,
                             weight_decay=1e-4)
-resnet152 = nn.DataParallel(resnet152).cuda()
+if not cpu_distributed:
+    resnet152 = nn.DataParallel(resnet152).cuda()
+if use_ema:
+    ema = WeightEMA(resnet152.module.fc if not cpu_distributed else resnet152.fc, ema_decay)
 # Training part
 split = 'train'
 prev_loss = -1
 curr_loss = 0
+throughput = Throughput()
 start_time = time.time()
 for epoch in range(training_epoch):
     anno_path = '/home/jason6582/sfyc/attention-tensorflow/pascal2007/pascaldata/%s/%s.annotations.pkl'\
@@ -62,34 +82,58 @@ for epoch in range(training_epoch):
 
     all_feats = np.ndarray([n_examples, 196, 1024], dtype=np.float32)
 
-    for start, end in zip(range(0, n_examples, batch_size),
-                        range(batch_size, n_examples + batch_size, batch_size)):
-        image_batch_file = image_path[start:end]
+    # equal-sized disjoint shards so every process takes the same number of steps, from a
+    # permutation seeded with the epoch: the same on every process, and the images left over
+    # by the equal split change from epoch to epoch
+    shard = np.random.RandomState(epoch).permutation(n_examples)[rank::world_size][:n_examples // world_size]
+    throughput.reset()
+    for start, end in zip(range(0, len(shard), batch_size),
+                        range(batch_size, len(shard) + batch_size, batch_size)):
+        image_batch_file = [image_path[idx] for idx in shard[start:end]]
         input_batch = np.array(map(lambda x: ndimage.imread(x, mode='RGB'),\
                 image_batch_file))
         input_batch = input_batch.astype(np.float32)
         input_batch = np.transpose(input_batch, (0, 3, 1, 2))
-        input_batch = torch.Tensor(input_batch).cuda()
-        input_var = Variable(input_batch).cuda()
-        groundtruth_batch = groundtruth[start:end]
-        groundtruth_batch = torch.Tensor(groundtruth_batch).cuda()
-        target_var = Variable(groundtruth_batch, requires_grad=False).cuda()
+        input_batch = torch.Tensor(input_batch)
+        groundtruth_batch = groundtruth[shard[start:end]]
+        groundtruth_batch = torch.Tensor(groundtruth_batch)
+        if cpu_distributed:
+            input_var = Variable(input_batch)
+            target_var = Variable(groundtruth_batch, requires_grad=False)
+        else:
+            input_var = Variable(input_batch).cuda()
+            target_var = Variable(groundtruth_batch, requires_grad=False).cuda()
 
         output = resnet152(input_var)
         loss = criterion(output, target_var)
         curr_loss += loss.data.cpu().numpy()[0]
         optimizer.zero_grad()
         loss.backward()
+        if cpu_distributed:
+            all_reduce_gradients(resnet152, world_size)
         optimizer.step()
+        if use_ema:
+            ema.update()
+        throughput.update(len(image_batch_file))
     print "Previous epoch loss: ", prev_loss
     print "Current epoch loss: ", curr_loss
     print "Elapsed time: ", time.time() - start_time
+    local_rate, total_rate = throughput.report(world_size)
+    print "Throughput: %.2f images/s (rank %d), %.2f images/s (%d processes)" \
+          % (local_rate, rank, total_rate, world_size)
     prev_loss = curr_loss
     curr_loss = 0
-    if (epoch+1) % save_every == 0:
+    if cpu_distributed:
+        all_reduce_buffers(resnet152, world_size)
+    if (epoch+1) % save_every == 0 and rank == 0:
         filename = 'model/resnet_init_pred_%s.pth.tar' % str(epoch+1)
         print filename, 'saved.\n'
-        torch.save(resnet152.state_dict(), filename)
+        state_dict = module_state_dict(resnet152) if cpu_distributed else resnet152.state_dict()
+        torch.save(state_dict, filename)
+        if use_ema:
+            filename = 'model/resnet_init_pred_ema_%s.pth.tar' % str(epoch+1)
+            print filename, 'saved.\n'
+            torch.save(ema.apply(state_dict, 'module.fc.'), filename)
 
 
 